@@ -3,6 +3,7 @@ Load a dataset from the given experiment configuration.
 """
 
 from pathlib import Path
+from typing import Literal
 
 import h5py
 import numpy as np
@@ -10,7 +11,9 @@ from pydantic import BaseModel, Field
 
 from fm4ar.datasets.dataset import SpectraDataset
 from fm4ar.datasets.theta_scalers import get_theta_scaler
+from fm4ar.utils.hdf import LazyHDFArray, read_rows_from_hdf
 from fm4ar.utils.paths import expand_env_variables_in_path
+from fm4ar.utils.zarr_store import open_zarr_store, read_rows_from_zarr
 
 
 class DatasetConfig(BaseModel):
@@ -20,7 +23,10 @@ class DatasetConfig(BaseModel):
 
     file_path: Path = Field(
         ...,
-        description="Path to the HDF5 file containing the dataset.",
+        description=(
+            "Path to the HDF5 file containing the dataset. Paths with the "
+            "suffix `.zarr` are loaded as zarr stores instead."
+        ),
     )
     n_train_samples: int = Field(
         ...,
@@ -30,6 +36,24 @@ class DatasetConfig(BaseModel):
         ...,
         description="Number of samples to use for validation.",
     )
+    dtype: Literal["float32", "float64"] = Field(
+        default="float32",
+        description=(
+            "Data type in which `theta`, `flux`, and `wlen` are held in "
+            "memory. The samples returned by the `SpectraDataset` are always "
+            "converted to float32, so storing the data as float64 usually "
+            "only doubles the memory footprint."
+        ),
+    )
+    lazy: bool = Field(
+        default=False,
+        description=(
+            "If True, `theta` and `flux` are not loaded into memory, but "
+            "read from the HDF5 file on demand (i.e., one sample at a time "
+            "in `SpectraDataset.__getitem__()`). This is useful for datasets "
+            "that do not fit into memory."
+        ),
+    )
     random_seed: int = Field(
         default=42,
         description=(
@@ -58,13 +82,47 @@ def load_dataset(config: dict) -> SpectraDataset:
     n_samples = dataset_config.n_train_samples + dataset_config.n_valid_samples
 
     # Load the dataset
-    with h5py.File(file_path, "r") as f:
-        theta = np.array(f["theta"][:n_samples])
-        flux = np.array(f["flux"][:n_samples])
-        wlen = np.array(
-            f["wlen"] if len(f["wlen"].shape) == 1 else f["wlen"][:n_samples]
+    # The values are converted to the target `dtype` while reading, so that
+    # we never hold a full copy of the data in the original (float64) type.
+    dtype = np.dtype(dataset_config.dtype)
+    theta: np.ndarray | LazyHDFArray
+    flux: np.ndarray | LazyHDFArray
+
+    # Datasets stored as zarr (see `fm4ar.utils.zarr_store`) are read with
+    # the Blosc decompression running in parallel, so there is no need for
+    # a chunk cache here. The `lazy` option is only supported for HDF5.
+    if file_path.suffix == ".zarr":
+        if dataset_config.lazy:
+            raise ValueError("`lazy` is only supported for HDF5 datasets!")
+        root = open_zarr_store(file_path)
+        theta = read_rows_from_zarr(root["theta"], n_samples, dtype)
+        flux = read_rows_from_zarr(root["flux"], n_samples, dtype)
+        wlen = read_rows_from_zarr(
+            root["wlen"], None if root["wlen"].ndim == 1 else n_samples, dtype
         )
 
+    # For HDF5 files, we read directly into preallocated arrays to avoid an
+    # extra copy. The larger chunk cache (64 MB instead of the default 1 MB)
+    # ensures that a row-aligned chunk is only read (and decompressed) once.
+    # If `lazy` is set, we only create views of `theta` and `flux` that read
+    # the requested rows on demand (`wlen` is usually small, so we load it).
+    else:
+        with h5py.File(
+            file_path,
+            "r",
+            rdcc_nbytes=64 * 1024**2,
+            rdcc_nslots=10_007,
+        ) as f:
+            if dataset_config.lazy:
+                theta = LazyHDFArray(file_path, "theta", n_samples, dtype)
+                flux = LazyHDFArray(file_path, "flux", n_samples, dtype)
+            else:
+                theta = read_rows_from_hdf(f["theta"], n_samples, dtype)
+                flux = read_rows_from_hdf(f["flux"], n_samples, dtype)
+            wlen = read_rows_from_hdf(
+                f["wlen"], None if f["wlen"].ndim == 1 else n_samples, dtype
+            )
+
     # TODO: Add support for filtering the dataset, e.g., based on mean flux
 
     # Ensure that wlen is 2D
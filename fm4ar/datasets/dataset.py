@@ -10,6 +10,7 @@ from torch.utils.data import Dataset
 
 from fm4ar.datasets.data_transforms import DataTransform
 from fm4ar.datasets.theta_scalers import IdentityScaler, ThetaScaler
+from fm4ar.utils.hdf import LazyHDFArray
 
 
 class SpectraDataset(Dataset):
@@ -19,8 +20,8 @@ class SpectraDataset(Dataset):
 
     def __init__(
         self,
-        theta: np.ndarray,
-        flux: np.ndarray,
+        theta: np.ndarray | LazyHDFArray,
+        flux: np.ndarray | LazyHDFArray,
         wlen: np.ndarray,
         theta_scaler: ThetaScaler | None = None,
     ) -> None:
@@ -35,8 +36,10 @@ class SpectraDataset(Dataset):
         Args:
             theta: Atmospheric parameters (e.g., abundances).
                 Expected shape: (n_samples, dim_theta).
+                Can also be a `LazyHDFArray` to read samples on demand.
             flux: Array with the fluxes of the spectra.
                 Expected shape: (n_samples, dim_x).
+                Can also be a `LazyHDFArray` to read samples on demand.
             wlen: Wavelengths to which the `flux` values correspond to.
                 Expected shape(s):
                     - (1, dim_x): Same wavelength for all spectra.
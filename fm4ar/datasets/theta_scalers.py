@@ -58,9 +58,15 @@ class IdentityScaler(ThetaScaler):
     def forward(self, x: Mapping[str, np.ndarray]) -> dict[str, np.ndarray]:
         return dict(x)
 
+    def forward_tensor(self, x: torch.Tensor) -> torch.Tensor:
+        return x
+
     def inverse(self, x: Mapping[str, np.ndarray]) -> dict[str, np.ndarray]:
         return dict(x)
 
+    def inverse_tensor(self, x: torch.Tensor) -> torch.Tensor:
+        return x
+
 
 class MeanStdScaler(ThetaScaler):
     """
@@ -83,11 +89,19 @@ class MeanStdScaler(ThetaScaler):
         output["theta"] = (x["theta"] - self.mean) / self.std
         return output
 
+    def forward_tensor(self, x: torch.Tensor) -> torch.Tensor:
+        mean, std = _as_tensors_like(x, self.mean, self.std)
+        return (x - mean) / std
+
     def inverse(self, x: Mapping[str, np.ndarray]) -> dict[str, np.ndarray]:
         output = dict(x)
         output["theta"] = x["theta"] * self.std + self.mean
         return output
 
+    def inverse_tensor(self, x: torch.Tensor) -> torch.Tensor:
+        std, mean = _as_tensors_like(x, self.std, self.mean)
+        return torch.addcmul(mean, x, std)
+
 
 class MinMaxScaler(ThetaScaler):
     """
@@ -111,11 +125,39 @@ class MinMaxScaler(ThetaScaler):
         output["theta"] = (x["theta"] - self.minimum) / self.difference
         return output
 
+    def forward_tensor(self, x: torch.Tensor) -> torch.Tensor:
+        minimum, difference = _as_tensors_like(
+            x, self.minimum, self.difference
+        )
+        return (x - minimum) / difference
+
     def inverse(self, x: Mapping[str, np.ndarray]) -> dict[str, np.ndarray]:
         output = dict(x)
         output["theta"] = x["theta"] * self.difference + self.minimum
         return output
 
+    def inverse_tensor(self, x: torch.Tensor) -> torch.Tensor:
+        difference, minimum = _as_tensors_like(
+            x, self.difference, self.minimum
+        )
+        return torch.addcmul(minimum, x, difference)
+
+
+def _as_tensors_like(
+    x: torch.Tensor,
+    *arrays: np.ndarray,
+) -> tuple[torch.Tensor, ...]:
+    """
+    Convert the given (parameter) arrays to tensors with the same dtype
+    and on the same device as `x`. This allows the affine scalers to
+    transform tensors directly on the device where they live, instead of
+    taking a round trip through NumPy on the host.
+    """
+
+    return tuple(
+        torch.as_tensor(a, dtype=x.dtype, device=x.device) for a in arrays
+    )
+
 
 def get_theta_scaler(config: dict[str, Any]) -> ThetaScaler:
     """
@@ -4,7 +4,7 @@ to load such a configuration from a YAML file.
 """
 
 from pathlib import Path
-from typing import Any
+from typing import Annotated, Any, Literal
 
 from pydantic import BaseModel, ConfigDict, Field
 from yaml import safe_load
@@ -20,10 +20,14 @@ class DrawProposalSamplesConfig(BaseModel):
     Configuration for the "draw proposal samples" stage.
     """
 
-    chunk_size: int = Field(
+    chunk_size: Annotated[int, Field(ge=1)] | Literal["auto"] = Field(
         default=1024,
-        ge=1,
-        description="Number of proposal samples to draw at once.",
+        description=(
+            "Number of proposal samples to draw at once. If 'auto', the "
+            "chunk size is estimated from the free GPU memory (for FMPE and "
+            "NPE models only; unconditional flows, or runs without a GPU, "
+            "use a chunk size of 1024)."
+        ),
     )
     n_samples: int = Field(
         ...,
@@ -34,6 +38,15 @@ class DrawProposalSamplesConfig(BaseModel):
         default=False,
         description="Use AMP for the proposal sampling?",
     )
+    use_compile: bool = Field(
+        default=False,
+        description=(
+            "Compile the network with `torch.compile()` before sampling? "
+            "This only affects FMPE models, where the network is evaluated "
+            "many times per chunk (once per step of the ODE solver), so "
+            "that the one-time compilation cost can pay off."
+        ),
+    )
     htcondor: HTCondorConfig
 
 
@@ -54,6 +67,21 @@ class SimulateSpectraConfig(BaseModel):
     Configuration for the "simulate spectra" stage.
     """
 
+    flux_dtype: Literal["float32", "float16"] = Field(
+        default="float32",
+        description=(
+            "Data type in which the simulated spectra are stored. Using "
+            "float16 halves the size of the simulation (and results) files, "
+            "but it only has a precision of about 3 significant digits and a "
+            "(normal) range of about 6.1e-5 to 65504. It should therefore "
+            "only be used for spectra that are normalized to values of order "
+            "one (e.g., the `vasist_2023` spectra). If any absolute value is "
+            "above this range (including inf), or any non-zero absolute value "
+            "is below it, a warning is printed and the spectra of that job "
+            "are stored as float32 instead (the merged files then use "
+            "float32, too)."
+        ),
+    )
     htcondor: HTCondorConfig
 
 
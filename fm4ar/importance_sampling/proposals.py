@@ -4,7 +4,7 @@ Methods for drawing samples from a proposal distribution.
 
 from argparse import Namespace
 from pathlib import Path
-from typing import Any
+from typing import Any, Callable, Literal
 
 import numpy as np
 import torch
@@ -19,6 +19,11 @@ from fm4ar.torchutils.general import set_random_seed
 from fm4ar.unconditional_flow.config import load_config as load_flow_config
 from fm4ar.utils.config import load_config as load_experiment_config
 
+# Chunk size that is used whenever the chunk size cannot be determined
+# automatically: either because there is no GPU (see `estimate_chunk_size()`)
+# or because the model does not support it (i.e., for unconditional flows)
+DEFAULT_CHUNK_SIZE = 1024
+
 
 def draw_proposal_samples(
     args: Namespace,
@@ -77,16 +82,22 @@ def draw_proposal_samples(
             model_kwargs=config.model_kwargs,
             random_seed=config.random_seed + args.job,
             use_amp=config.draw_proposal_samples.use_amp,
+            use_compile=config.draw_proposal_samples.use_compile,
         )
 
     # ... or from an unconditional flow model
     elif model_type == "unconditional_flow":
 
+        # Automatic chunk sizes are not supported for unconditional flows,
+        # so we fall back to the same default as `estimate_chunk_size()`
+        chunk_size = config.draw_proposal_samples.chunk_size
         print("Running for unconditional flow model!\n")
         results = draw_samples_from_unconditional_flow(
             experiment_dir=args.experiment_dir,
             n_samples=n_for_job,
-            chunk_size=config.draw_proposal_samples.chunk_size,
+            chunk_size=(
+                DEFAULT_CHUNK_SIZE if chunk_size == "auto" else chunk_size
+            ),
             random_seed=config.random_seed + args.job,
         )
 
@@ -102,10 +113,11 @@ def draw_samples_from_ml_model(
     n_samples: int,
     experiment_dir: Path,
     checkpoint_file_name: str,
-    chunk_size: int = 1024,
+    chunk_size: int | Literal["auto"] = 1024,
     model_kwargs: dict[str, Any] | None = None,
     random_seed: int = 42,
     use_amp: bool = False,
+    use_compile: bool = False,
 ) -> dict[str, np.ndarray]:
     """
     Load a trained ML model (NPE or FMPE) and draw samples from it,
@@ -124,12 +136,19 @@ def draw_samples_from_ml_model(
         checkpoint_file_name: Name of the checkpoint file to load.
         chunk_size: Size of the "chunks" for drawing samples (i.e., the
             number of samples drawn at once). This is used to avoid
-            running out of GPU memory.
+            running out of GPU memory. If "auto", the chunk size is
+            determined from the free GPU memory using a trial chunk
+            (see `estimate_chunk_size()`).
         model_kwargs: Additional keyword arguments for the model.
             This is useful for specifying the tolerance for FMPE models.
         random_seed: Random seed for the random number generator.
         use_amp: If True, use automatic mixed-precision for the model.
             This only makes sense for FMPE models.
+        use_compile: If True, compile the network of the model using
+            `torch.compile()`. This only affects FMPE models, where the
+            network (i.e., the vector field) is evaluated once for every
+            step of the ODE solver. The sampling methods of NPE models
+            do not go through the `forward()` of the network.
     """
 
     device = "cuda" if torch.cuda.is_available() else "cpu"
@@ -145,6 +164,17 @@ def draw_samples_from_ml_model(
     model.network.eval()
     print("Done!")
 
+    # Select the gradient mode for sampling: `torch.inference_mode()` is a bit
+    # cheaper than `torch.no_grad()` (no version counters or view tracking),
+    # but we cannot use it for FMPE models, which need autograd to compute
+    # the divergence of the vector field (see `FMPEModel.compute_divergence`)
+    # and this does not work with inference tensors, even with `enable_grad`.
+    grad_mode = (
+        torch.no_grad
+        if model.__class__.__name__ == "FMPEModel"
+        else torch.inference_mode
+    )
+
     # Fix the global seed for PyTorch.
     # Note: This needs to happen *after* loading the model, because the model
     # constructor will set the random seed itself (see `initialize_network()`).
@@ -159,10 +189,69 @@ def draw_samples_from_ml_model(
     theta_scaler = get_theta_scaler(config=config["theta_scaler"])
     print("Done!\n")
 
+    # Move the context to the device only once (and not for every chunk).
+    # All context tensors are first packed into a single contiguous (fp32)
+    # buffer, so that we only need to do a single (pinned, non-blocking)
+    # host-to-device transfer; the individual tensors are views into it.
+    packed_context = torch.cat(
+        [v.reshape(-1).float() for v in context.values()]
+    )
+    if device == "cuda":
+        packed_context = packed_context.pin_memory()
+    packed_context = packed_context.to(device, non_blocking=True)
+    context_views = dict(
+        zip(
+            context.keys(),
+            torch.split(packed_context, [v.numel() for v in context.values()]),
+            strict=True,
+        )
+    )
+
+    # If desired, determine the chunk size from the free GPU memory. Because
+    # the trial chunk consumes random numbers, we reset the seed afterwards.
+    if chunk_size == "auto":
+        print("Estimating chunk size...", end=" ", flush=True)
+
+        def sample_trial_chunk(n: int) -> Any:
+            with torch.cuda.amp.autocast(enabled=use_amp):
+                return model.sample_and_log_prob_batch(
+                    context={
+                        k: v.reshape(1, -1).expand(n, -1)
+                        for k, v in context_views.items()
+                    },
+                    **model_kwargs,
+                )
+
+        chunk_size = estimate_chunk_size(sample_fn=sample_trial_chunk)
+        set_random_seed(random_seed)
+        print(f"Done! (chunk_size={chunk_size:,})\n")
+
+    # Optionally, compile the network. The compilation happens lazily, that
+    # is, during the first chunk (and once more for the last chunk, which
+    # usually has a different size). We use `dynamic=False` because all
+    # other chunks have the same size, and static shapes are faster.
+    # Note: This needs to happen *after* estimating the chunk size, because
+    # otherwise, the trial chunk would trigger an extra compilation (for its
+    # own shape), whose workspace would also distort the memory estimate.
+    if use_compile and model.__class__.__name__ == "FMPEModel":
+        print("Compiling network...", end=" ")
+        model.network = torch.compile(model.network, dynamic=False)
+        print("Done!")
+
+    # The context is the same for every sample, so we only `expand()` it to
+    # the chunk size instead of using `repeat()`: This creates a (stride-0)
+    # view rather than materializing `max_chunk_size` copies on the device.
+    # Layers that require contiguous inputs will copy the data as needed.
+    max_chunk_size = max(1, min(chunk_size, n_samples))
+    device_context = {
+        k: v.reshape(1, -1).expand(max_chunk_size, -1)
+        for k, v in context_views.items()
+    }
+
     # If desired, compute the log-probability of the ground truth theta
     if theta_true is not None:
         print("Computing log-probability of ground truth theta...", end=" ")
-        with torch.no_grad():
+        with grad_mode():
             log_prob_theta_true = model.log_prob_batch(
                 theta=(
                     torch.from_numpy(theta_scaler.forward_array(theta_true))
@@ -170,10 +259,7 @@ def draw_samples_from_ml_model(
                     .reshape(1, -1)
                     .to(device, non_blocking=True)
                 ),
-                context={
-                    k: v.repeat(1, 1).to(device, non_blocking=True)
-                    for k, v in context.items()
-                },
+                context={k: v[:1] for k, v in device_context.items()},
                 **model_kwargs,
             ).cpu().numpy().flatten()
         print("Done!\n")
@@ -186,19 +272,37 @@ def draw_samples_from_ml_model(
     # except for the last one, which may have fewer samples.
     chunk_sizes = np.diff(np.r_[0: n_samples: chunk_size, n_samples])
 
-    # Draw samples from the model posterior ("proposal distribution")
+    # Draw samples from the model posterior ("proposal distribution").
+    # The inverse transform of the samples is applied on the device, so that
+    # the samples do not need to take a round trip through NumPy.
     print("Drawing samples from the model posterior:", flush=True)
-    samples_chunks = []
-    log_prob_chunks = []
-    with torch.no_grad():
-        for n in tqdm(chunk_sizes, ncols=80):
+
+    # Preallocate the output tensors and fill them chunk by chunk. Compared to
+    # collecting the chunks in a list and concatenating them at the end, this
+    # avoids an extra copy of all samples (and halves the peak memory usage).
+    # On the GPU, the outputs live in pinned host memory, so every chunk can
+    # be copied directly into its slice with a non-blocking transfer, and we
+    # only need to synchronize once at the end (instead of once per chunk).
+    dim_theta = int(model.config["model"]["dim_theta"])
+    pin_memory = device == "cuda"
+    samples = torch.empty(
+        (n_samples, dim_theta),
+        dtype=torch.float32,
+        pin_memory=pin_memory,
+    )
+    log_prob_samples = torch.empty(
+        n_samples,
+        dtype=torch.float32,
+        pin_memory=pin_memory,
+    )
+    offsets = np.r_[0, np.cumsum(chunk_sizes)]
+
+    with grad_mode():
+        for i, n in enumerate(tqdm(chunk_sizes, ncols=80)):
 
             # Adjust the size of the context so that the batch size matches
-            # the desired chunk size, and move it to the correct device
-            chunk_context = {
-                k: v.repeat(n, 1).to(device, non_blocking=True)
-                for k, v in context.items()
-            }
+            # the desired chunk size (this does not copy any data)
+            chunk_context = {k: v[:n] for k, v in device_context.items()}
 
             # Draw samples and corresponding log-probs from the model
             with torch.cuda.amp.autocast(enabled=use_amp):
@@ -207,22 +311,28 @@ def draw_samples_from_ml_model(
                     **model_kwargs,
                 )
 
-            # Inverse-transform the theta samples and store the chunks
-            samples_chunks.append(
-                theta_scaler.inverse_tensor(chunk[0].cpu()).numpy()
+            # Copy the chunk into the output tensors (asynchronously on GPU).
+            # This also takes care of converting from fp16 (AMP) to fp32.
+            start, end = offsets[i], offsets[i + 1]
+            samples[start:end].copy_(
+                theta_scaler.inverse_tensor(chunk[0]),
+                non_blocking=True,
+            )
+            log_prob_samples[start:end].copy_(
+                chunk[1].flatten(),
+                non_blocking=True,
             )
-            log_prob_chunks.append(chunk[1].cpu().numpy())
             del chunk
 
-    print(flush=True)
+    # Wait for all copies to finish before we hand out the outputs
+    if device == "cuda":
+        torch.cuda.synchronize()
 
-    # Combine all chunks into a single numpy array
-    samples = np.concatenate(samples_chunks, axis=0)
-    log_prob_samples = np.concatenate(log_prob_chunks, axis=0).flatten()
+    print(flush=True)
 
     return {
-        "samples": samples,
-        "log_prob_samples": log_prob_samples,
+        "samples": samples.numpy(),
+        "log_prob_samples": log_prob_samples.numpy(),
         "log_prob_theta_true": log_prob_theta_true,
     }
 
@@ -284,25 +394,91 @@ def draw_samples_from_unconditional_flow(
     chunk_sizes = np.diff(np.r_[0: n_samples: chunk_size, n_samples])
 
     # Draw samples from the unconditional flow model
+    # The outputs are preallocated (in pinned memory on the GPU) and filled
+    # with non-blocking copies; see `draw_samples_from_ml_model()`.
     print("Drawing samples from unconditional flow:", flush=True)
-    samples_chunks = []
-    log_prob_chunks = []
-    with torch.no_grad():
+    pin_memory = device == "cuda"
+    samples = torch.empty(
+        (n_samples, checkpoint["dim_theta"]),
+        dtype=torch.float32,
+        pin_memory=pin_memory,
+    )
+    log_prob_samples = torch.empty(
+        n_samples,
+        dtype=torch.float32,
+        pin_memory=pin_memory,
+    )
+    offsets = np.r_[0, np.cumsum(chunk_sizes)]
+    with torch.inference_mode():
 
         # Draw samples in chunks and inverse-transform them
-        for n in tqdm(chunk_sizes, ncols=80):
+        for i, n in enumerate(tqdm(chunk_sizes, ncols=80)):
             chunk = model.sample_and_log_prob(context=None, num_samples=n)
-            samples_chunks.append(theta_scaler.inverse_tensor(chunk[0].cpu()))
-            log_prob_chunks.append(chunk[1].cpu())
+            start, end = offsets[i], offsets[i + 1]
+            samples[start:end].copy_(
+                theta_scaler.inverse_tensor(chunk[0]),
+                non_blocking=True,
+            )
+            log_prob_samples[start:end].copy_(
+                chunk[1].flatten(),
+                non_blocking=True,
+            )
 
-        # Combine all chunks into a single array
-        samples = torch.cat(samples_chunks, dim=0).numpy()
-        log_prob_samples = torch.cat(log_prob_chunks, dim=0).numpy().flatten()
+    # Wait for all copies to finish before we hand out the outputs
+    if device == "cuda":
+        torch.cuda.synchronize()
 
     print("Done!\n")
 
     return {
-        "samples": samples,
-        "log_prob_samples": log_prob_samples,
+        "samples": samples.numpy(),
+        "log_prob_samples": log_prob_samples.numpy(),
         "log_prob_theta_true": np.full(1, np.nan),  # not supported for now
     }
+
+
+def estimate_chunk_size(
+    sample_fn: Callable[[int], Any],
+    n_trial: int = 64,
+    safety_factor: float = 0.7,
+    default: int = DEFAULT_CHUNK_SIZE,
+) -> int:
+    """
+    Estimate the largest chunk size that fits into the free GPU memory.
+
+    To this end, we draw a single trial chunk with `n_trial` samples,
+    measure the peak memory usage (per sample), and scale the result
+    to the currently free memory (times a `safety_factor`). Because the
+    number of steps of adaptive ODE solvers can vary between chunks,
+    this is only an estimate, hence the safety factor.
+
+    Args:
+        sample_fn: Function that draws a chunk with the given number
+            of samples (and returns the result).
+        n_trial: Number of samples in the trial chunk. This is also
+            the smallest chunk size that we ever return.
+        safety_factor: Fraction of the free memory that we use.
+        default: Chunk size to return if no GPU is available.
+
+    Returns:
+        The estimated chunk size.
+    """
+
+    if not torch.cuda.is_available():
+        return default
+
+    # Measure the peak memory usage for the trial chunk
+    torch.cuda.synchronize()
+    torch.cuda.reset_peak_memory_stats()
+    baseline = torch.cuda.memory_allocated()
+    with torch.no_grad():
+        result = sample_fn(n_trial)
+    torch.cuda.synchronize()
+    peak = torch.cuda.max_memory_allocated() - baseline
+    del result
+
+    # Scale the peak memory usage to the free memory
+    nbytes_per_sample = max(1, peak) / n_trial
+    free_nbytes, _ = torch.cuda.mem_get_info()
+
+    return max(n_trial, int(safety_factor * free_nbytes / nbytes_per_sample))
@@ -6,9 +6,26 @@ import numpy as np
 from scipy.special import logsumexp
 
 
+def _get_weights_dtype(
+    *arrays: np.ndarray,
+    dtype: type | str | None = None,
+) -> np.dtype:
+    """
+    Get the data type for the (raw) log-weights: either the given
+    `dtype`, or, by default, the result type of the inputs, but at
+    least float64 (see `compute_raw_log_weights()`).
+    """
+
+    if dtype is not None:
+        return np.dtype(dtype)
+    return np.result_type(*arrays, np.float64)
+
+
 def clip_and_normalize_weights(
     raw_log_weights: np.ndarray,
     percentile: float | None = None,
+    lse: float | None = None,
+    out: np.ndarray | None = None,
 ) -> np.ndarray:
     """
     Normalize the raw log-weights (and optionally clip them first).
@@ -20,17 +37,34 @@ def clip_and_normalize_weights(
         raw_log_weights: Raw log-weights.
         percentile: (Upper) percentile for clipping. If `None`, no
             clipping is applied (this is the default).
+        lse: Precomputed log-sum-exp of the (clipped) log-weights. If
+            the caller already knows this value, passing it here saves
+            one pass over the weights. If `None`, it is computed.
+        out: Optional output array (with the same shape as the raw
+            log-weights) into which the normalized weights are written.
+            If `None`, a new array is allocated.
 
     Returns:
         normalized_weights: Normalized importance sampling weights.
     """
 
+    # Copy the raw log-weights into the output buffer; all further steps
+    # (clipping and normalization) are performed in-place in this buffer
+    if out is None:
+        normalized_weights = np.array(
+            raw_log_weights,
+            dtype=np.result_type(raw_log_weights, np.float32),
+        )
+    else:
+        normalized_weights = out
+        np.copyto(normalized_weights, raw_log_weights)
+
     # Clip the raw log-weights, if desired
+    # Note: `np.percentile()` does not sort the full array, but uses a
+    # selection algorithm (`np.partition()`) internally, so this is O(N).
     if percentile is not None:
         threshold = np.percentile(raw_log_weights, percentile)
-        clipped_weights = np.clip(raw_log_weights, None, threshold)
-    else:
-        clipped_weights = raw_log_weights
+        np.minimum(normalized_weights, threshold, out=normalized_weights)
 
     # Normalize the clipped log-weights
     # In "normal" space, we normalize the raw weights such that they sum to
@@ -46,22 +80,32 @@ def clip_and_normalize_weights(
     # ever needing access to the (raw) likelihoods, priors, or proposals.
     # For more details about the log-sum-exp trick, see, e.g.,:
     # https://gregorygundersen.com/blog/2020/02/09/log-sum-exp/
+    # Instead of calling `logsumexp()` and then exponentiating again, we use
+    # the equivalent form
+    #   n_i = N * exp{ log(w_i) - m } / sum_j exp{ log(w_j) - m } ,
+    # where m = max(log(w_i)). This way, we need only a single exp() for each
+    # sample. If the LSE is given, we can use the first expression directly.
     N = len(raw_log_weights)
-    normalized_weights = np.exp(
-        np.log(N) + clipped_weights - logsumexp(clipped_weights)
-    )
+    if lse is not None:
+        normalized_weights += np.log(N) - lse
+        np.exp(normalized_weights, out=normalized_weights)
+    else:
+        normalized_weights -= np.max(normalized_weights, initial=-np.inf)
+        np.exp(normalized_weights, out=normalized_weights)
+        normalized_weights *= N / np.sum(normalized_weights)
 
-    return np.array(normalized_weights)
+    return normalized_weights
 
 
-def compute_is_weights(
+def compute_raw_log_weights(
     log_likelihoods: np.ndarray,
     log_prior_values: np.ndarray,
     log_probs: np.ndarray,
-) -> tuple[np.ndarray, np.ndarray]:
+    dtype: type | str | None = None,
+    out: np.ndarray | None = None,
+) -> np.ndarray:
     """
-    Compute the importance sampling weights: both the raw weights in
-    log-space and the normalized weights in "normal" space.
+    Compute the raw importance sampling weights in log-space.
 
     Args:
         log_likelihoods: Log-likelihood values.
@@ -70,20 +114,83 @@ def compute_is_weights(
             i.e., the probabilities returned by the ML model. Note
             that, technically, these are probability *densities*, so
             they do not have to be in [0, 1].
+        dtype: Data type in which the weights are computed. If None
+            (default), this is at least float64 (see below). Passing
+            `np.float32` halves the memory (bandwidth) requirements,
+            but should only be used if the log-weights are known to
+            be small, e.g., for (approximately) normalized inputs.
+            Ignored if `out` is given.
+        out: Optional output array into which the raw log-weights are
+            written. If `None`, a new array is allocated.
 
     Returns:
         raw_log_weights: Raw log-weights (without normalization).
-        normalized_weights: Normalized importance sampling weights.
     """
 
-    # Compute the raw log-weights
     # In "normal" space, the raw importance sampling weights are given by:
     #   w_i = L_i * p_i / q_i ,
     # where L_i is the likelihood, p_i is the prior, and q_i is the proposal.
     # However, L_i is usually very small, so we use the log-weights instead.
-    raw_log_weights = log_likelihoods + log_prior_values - log_probs
+    # We compute the sum in-place in a single output array, which avoids the
+    # temporary array that `log_likelihoods + log_prior_values` would create.
+    # By default, the output is (at least) float64: The inputs are usually
+    # stored as float32, but the log-likelihoods can be O(10^3) or larger,
+    # where the resolution of float32 is already ~10^-4, and the differences
+    # between the log-weights are all that is left after the normalization.
+    if out is None:
+        out = np.empty(
+            shape=np.broadcast_shapes(
+                np.shape(log_likelihoods),
+                np.shape(log_prior_values),
+                np.shape(log_probs),
+            ),
+            dtype=_get_weights_dtype(
+                log_likelihoods, log_prior_values, log_probs, dtype=dtype
+            ),
+        )
+    np.add(log_likelihoods, log_prior_values, out=out)
+    np.subtract(out, log_probs, out=out)
+
+    return out
+
+
+def compute_is_weights(
+    log_likelihoods: np.ndarray,
+    log_prior_values: np.ndarray,
+    log_probs: np.ndarray,
+    dtype: type | str | None = None,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Compute the importance sampling weights: both the raw weights in
+    log-space and the normalized weights in "normal" space.
+
+    If only one of the two is needed, use `compute_raw_log_weights()`
+    and / or `clip_and_normalize_weights()` directly.
+
+    Args:
+        log_likelihoods: Log-likelihood values.
+        log_prior_values: Log-prior values.
+        log_probs: Log-probabilities under the proposal distribution.
+        dtype: Data type in which the weights are computed. See
+            `compute_raw_log_weights()` for details.
+
+    Returns:
+        raw_log_weights: Raw log-weights (without normalization).
+        normalized_weights: Normalized importance sampling weights.
+    """
+
+    # Compute the raw log-weights
+    raw_log_weights = compute_raw_log_weights(
+        log_likelihoods=log_likelihoods,
+        log_prior_values=log_prior_values,
+        log_probs=log_probs,
+        dtype=dtype,
+    )
 
     # Normalize the raw log-weights (by default without weight clipping)
+    # The normalized weights get their own array (instead of, e.g., sharing
+    # one buffer with the raw log-weights), so that a caller that keeps only
+    # one of them does not keep the memory for the other one alive
     normalized_weights = clip_and_normalize_weights(
         raw_log_weights=raw_log_weights,
         percentile=None,
@@ -116,8 +223,14 @@ def compute_effective_sample_size(
     """
 
     # Compute the effective sample size and the "raw" sampling efficiency,
-    # as it is required, e.g., to compute the log-evidence estimate
-    n_eff = float(np.sum(weights) ** 2 / np.sum(weights**2))
+    # as it is required, e.g., to compute the log-evidence estimate.
+    # Using `np.einsum()` for the sum of squares avoids allocating the array
+    # `weights**2`. Both sums are always accumulated in float64: for float32
+    # weights, `np.dot()` (i.e., BLAS `sdot`) and `np.sum()` would otherwise
+    # accumulate in float32, which is off by ~1e-4 already for 10^7 samples.
+    sum_w = weights.sum(dtype=np.float64)
+    sum_w_sq = np.einsum("i,i->", weights, weights, dtype=np.float64)
+    n_eff = float(sum_w ** 2 / sum_w_sq)
     sampling_efficiency = n_eff / len(weights)
 
     # Optionally: Compute the simulator efficiency
@@ -125,8 +238,10 @@ def compute_effective_sample_size(
     # from the number of proposal samples where the prior is non-zero: Those
     # are the samples for which we ran the simulator, even if the likelihood
     # came out as zero (e.g., because the simulation failed or timed out).
+    # `np.count_nonzero()` counts the mask directly, whereas `np.sum()` would
+    # first need to convert it to integers in (chunked) temporary buffers.
     if log_prior_values is not None:
-        n_simulator_calls = float(np.sum(log_prior_values > -np.inf))
+        n_simulator_calls = float(np.count_nonzero(log_prior_values > -np.inf))
         simulator_efficiency = n_eff / n_simulator_calls
     else:
         simulator_efficiency = np.nan
@@ -148,16 +263,20 @@ def compute_log_evidence(
         log_evidence_std: Standard deviation of the log-evidence.
     """
 
+    # Compute the LSE of the raw log-weights only once: we need it both for
+    # the normalization of the weights and for the log-evidence estimate
+    # noinspection PyUnresolvedReferences
+    lse = float(logsumexp(raw_log_weights))
+
     # Normalize the raw log-weights
-    weights = clip_and_normalize_weights(raw_log_weights)
+    weights = clip_and_normalize_weights(raw_log_weights, lse=lse)
 
     # Compute the number of samples and the effective sample size
     n = len(raw_log_weights)
     n_eff, _, _ = compute_effective_sample_size(weights)
 
     # Copmute the log-evidence estimate and its standard deviation
-    # noinspection PyUnresolvedReferences
-    log_evidence = float(logsumexp(raw_log_weights) - np.log(n))
+    log_evidence = float(lse - np.log(n))
     log_evidence_std = float(np.sqrt((n - n_eff) / (n * n_eff)))
 
     return log_evidence, log_evidence_std
@@ -6,7 +6,6 @@ As of now, we only support multivariate normal distributions.
 from typing import Protocol
 
 import numpy as np
-from scipy.stats import multivariate_normal
 
 
 class LikelihoodDistribution(Protocol):
@@ -18,21 +17,84 @@ class LikelihoodDistribution(Protocol):
     a `logpdf` method.
     """
 
-    def pdf(self, x: np.ndarray) -> float:
+    def pdf(self, x: np.ndarray) -> float | np.ndarray:
         raise NotImplementedError  # pragma: no cover
 
-    def logpdf(self, x: np.ndarray) -> float:
+    def logpdf(self, x: np.ndarray) -> float | np.ndarray:
         raise NotImplementedError  # pragma: no cover
 
 
+class DiagonalGaussianLikelihood:
+    """
+    Multivariate normal distribution with a diagonal covariance matrix.
+
+    This is equivalent to `scipy.stats.multivariate_normal` with
+    `cov=np.diag(error_bars ** 2)`, but avoids the decomposition of a
+    dense (n_bins, n_bins) matrix and the corresponding matrix-vector
+    products: For a diagonal covariance, the log-density reduces to a
+    single sum over the (standardized) residuals, which can also be
+    evaluated for a whole batch of spectra at once.
+    """
+
+    def __init__(
+        self,
+        mean: np.ndarray,
+        error_bars: np.ndarray,
+    ) -> None:
+        """
+        Args:
+            mean: Mean of the distribution (i.e., the observed flux).
+            error_bars: Standard deviations of the (uncorrelated)
+                Gaussian noise for every bin.
+        """
+
+        self.mean = np.asarray(mean, dtype=np.float64)
+        self.error_bars = np.asarray(error_bars, dtype=np.float64)
+
+        # Precompute everything that does not depend on `x`: the likelihood
+        # is evaluated many times (e.g., once per live point during nested
+        # sampling) for the same `mean` and `error_bars`, so there is no need
+        # to recompute the inverse error bars or the normalization every time
+        self._inv_error_bars = 1.0 / self.error_bars
+        self._log_normalization = float(
+            -np.sum(np.log(self.error_bars))
+            - 0.5 * self.mean.shape[-1] * np.log(2 * np.pi)
+        )
+
+    def logpdf(self, x: np.ndarray) -> float | np.ndarray:
+        """
+        Evaluate the log-density for a single spectrum `x` with shape
+        (n_bins, ), or for a batch of spectra with shape (n, n_bins).
+        """
+
+        # Compute the standardized residuals with a single temporary array
+        # (instead of one for the difference and one for the product), and
+        # reduce them with `einsum()`, which does not allocate the squares
+        residuals = np.subtract(x, self.mean, dtype=np.float64)
+        residuals *= self._inv_error_bars
+        log_pdf = (
+            -0.5 * np.einsum("...i,...i->...", residuals, residuals)
+            + self._log_normalization
+        )
+
+        return float(log_pdf) if np.ndim(log_pdf) == 0 else log_pdf
+
+    def pdf(self, x: np.ndarray) -> float | np.ndarray:
+        """
+        Evaluate the density for a single spectrum or a batch.
+        """
+
+        pdf = np.exp(self.logpdf(x))
+
+        return float(pdf) if np.ndim(pdf) == 0 else pdf
+
+
 def get_likelihood_distribution(
     flux_obs: np.ndarray,
     error_bars: np.ndarray,
 ) -> LikelihoodDistribution:
 
-    # Construct the covariance matrix
     # For now, we simply assume that the errors are uncorrelated and that the
-    # `error_bars` are the standard deviations of the Gaussian noise.
-    cov = np.diag(error_bars ** 2)
-
-    return multivariate_normal(mean=flux_obs, cov=cov)  # type: ignore
+    # `error_bars` are the standard deviations of the Gaussian noise, that is,
+    # the covariance matrix is given by `np.diag(error_bars ** 2)`.
+    return DiagonalGaussianLikelihood(mean=flux_obs, error_bars=error_bars)
@@ -6,7 +6,7 @@ load such a configuration from a YAML file.
 from pathlib import Path
 from typing import Any, Literal
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 from yaml import safe_load
 
 from fm4ar.priors.config import PriorConfig
@@ -20,6 +20,10 @@ class SamplerConfig(BaseModel):
     Configuration for the nested sampling algorithm / sampler.
     """
 
+    # Reject unknown keys (e.g., typos in `n_livepoints`) instead of silently
+    # ignoring them and falling back to the defaults
+    model_config = ConfigDict(extra="forbid")
+
     library: Literal["nautilus", "dynesty", "multinest", "ultranest"] = Field(
         ...,
         description="Which nested sampling implementation to use.",
@@ -64,6 +68,8 @@ class NestedSamplingConfig(BaseModel):
     Full configuration for a nested sampling run.
     """
 
+    model_config = ConfigDict(extra="forbid")
+
     target_spectrum: TargetSpectrumConfig
     prior: PriorConfig
     sampler: SamplerConfig
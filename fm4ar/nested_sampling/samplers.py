@@ -6,7 +6,6 @@ import json
 import time
 import warnings
 from abc import ABC, abstractmethod
-from copy import deepcopy
 from functools import partial
 from importlib import import_module
 from pathlib import Path
@@ -91,15 +90,21 @@ class Sampler(ABC):
     ) -> dict[str, Any]:
         """
         Small utility function to convert the `sampler_kwargs` to a
-        dictionary if it is `None`. The `deepcopy()` is required so that
-        we can `pop()` the "special" keys without modifying the original
-        dictionary.
+        dictionary if it is `None`. The copy is required so that we can
+        `pop()` the "special" keys without modifying the original
+        dictionary. Since we only ever `pop()` from the top level or
+        from nested dictionaries (e.g., the `stepsampler` config), it
+        is sufficient to copy the dictionaries themselves instead of
+        doing a (recursive) `deepcopy()` of all values.
         """
 
-        return (
-            deepcopy(sampler_kwargs) if sampler_kwargs is not None
-            else {}
-        )
+        if sampler_kwargs is None:
+            return {}
+
+        return {
+            key: dict(value) if isinstance(value, dict) else value
+            for key, value in sampler_kwargs.items()
+        }
 
     @abstractmethod
     def run(
@@ -775,21 +780,32 @@ class UltraNestSampler(Sampler):
         offset = self.sampler.mpi_rank + self.sampler.ncall
         np.random.seed(random_seed + offset)  # noqa: NPY002
 
-        # Optional: Add step sampler (for now, we only support `SliceSampler`)
+        # Optional: Add step sampler. By default, we use the `SliceSampler`,
+        # but the `method` key can be used to select the vectorized
+        # `PopulationSliceSampler`, which advances `popsize` walkers at once
+        # and thus requires far fewer Python round-trips per iteration.
         # For more details about step samplers and settings, see:
         # https://arxiv.org/pdf/2211.09426
         if stepsampler_config:
 
-            import ultranest.stepsampler as stepsampler
+            # The population step samplers live in a separate module, which
+            # also provides (vectorized) versions of the direction generators
+            method = stepsampler_config.pop("method", "SliceSampler")
+            if method == "SliceSampler":
+                module = import_module("ultranest.stepsampler")
+            elif method == "PopulationSliceSampler":
+                module = import_module("ultranest.popstepsampler")
+            else:
+                raise ValueError(f"Unknown step sampler: {method}!")
 
             # Convert the `generate_direction` argument to a function object
             generate_direction = getattr(
-                import_module("ultranest.stepsampler"),
+                module,
                 stepsampler_config.pop("generate_direction")
             )
 
-            # Create the slice sampler
-            self.sampler.stepsampler = stepsampler.SliceSampler(
+            # Create the step sampler
+            self.sampler.stepsampler = getattr(module, method)(
                 generate_direction=generate_direction,
                 **stepsampler_config,
             )
@@ -839,7 +855,7 @@ class UltraNestSampler(Sampler):
         # Run the sampler with the given time limit
         while True:
 
-            n_call_before = deepcopy(self.sampler.ncall)
+            n_call_before = int(self.sampler.ncall)
 
             if self.sampler.mpi_rank == 0:
                 print("\n\n" + 80 * "-")
@@ -39,35 +39,44 @@ def get_parameter_masks(
             parameters.
     """
 
-    # Create empty masks
-    infer_mask = np.zeros(len(prior.names), dtype=bool)
-    marginalize_mask = np.zeros(len(prior.names), dtype=bool)
-    condition_mask = np.zeros(len(prior.names), dtype=bool)
-    condition_values = np.full(len(prior.names), np.nan)
-
-    # Loop over the parameters in the order of the prior and create the masks
-    for i, name in enumerate(prior.names):
-
-        # Get the action for the parameter
-        try:
-            action = config.parameters[name]
-        except KeyError as e:
+    # Look up the action for every parameter (in the order of the prior).
+    # Parameters that are missing from the configuration are mapped to an
+    # empty string, so that we can build all masks with vectorized string
+    # comparisons instead of setting them one parameter at a time.
+    names = np.array(prior.names, dtype=str)
+    actions = np.array(
+        [config.parameters.get(name, "") for name in prior.names],
+        dtype=str,
+    )
+    is_missing = np.array([n not in config.parameters for n in prior.names])
+
+    # Create the masks based on the actions
+    infer_mask = actions == "infer"
+    marginalize_mask = actions == "marginalize"
+    condition_mask = np.char.find(actions, "condition") >= 0
+
+    # Check for missing parameters and unknown actions. To be consistent
+    # with the order of the parameters, we only report the first problem.
+    is_invalid = is_missing | ~(infer_mask | marginalize_mask | condition_mask)
+    if is_invalid.any():
+        i = int(np.argmax(is_invalid))
+        if is_missing[i]:
             raise KeyError(
-                f"Parameter '{name}' not found in the configuration!"
-            ) from e
-
-        # Set the masks based on the action
-        if action == "infer":
-            infer_mask[i] = True
-        elif action == "marginalize":
-            marginalize_mask[i] = True
-        elif "condition" in action:
-            condition_mask[i] = True
-            condition_values[i] = float(action.split("=")[1])
-        else:
-            raise ValueError(
-                f"Unknown action '{action}' for parameter '{name}'"
+                f"Parameter '{names[i]}' not found in the configuration!"
             )
+        raise ValueError(
+            f"Unknown action '{actions[i]}' for parameter '{names[i]}'"
+        )
+
+    # Parse the values of the conditioned parameters (`condition = <value>`)
+    # Note: For an empty input, `np.char.partition()` returns an array with
+    # shape (0, ) instead of (0, 3), so we need to skip this case explicitly
+    condition_values = np.full(len(prior.names), np.nan)
+    if condition_mask.any():
+        condition_values[condition_mask] = (
+            np.char.partition(actions[condition_mask], "=")[:, 2]
+            .astype(np.float64)
+        )
 
     # Return the masks
     return infer_mask, marginalize_mask, condition_mask, condition_values
@@ -80,9 +89,23 @@ def create_posterior_plot(
     extents: tuple[np.ndarray, np.ndarray] | None,
     ground_truth: np.ndarray,
     file_path: Path,
+    max_plot_samples: int | None = 20_000,
 ) -> plt.Figure:
     """
     Create a corner plot of the posterior.
+
+    Args:
+        samples: Samples from the posterior, with shape (n, dim).
+        weights: Weights of the samples, with shape (n, ).
+        names: Names of the parameters.
+        extents: Optional tuple `(lower, upper)` with the plot limits.
+        ground_truth: Ground truth values of the parameters.
+        file_path: Path where to save the plot.
+        max_plot_samples: If there are more samples (with non-zero
+            weight) than this, we draw this many samples (with equal
+            weights) from the weighted samples and only plot those.
+            The cost of the KDEs in ChainConsumer grows super-linearly
+            with the number of samples. If None, plot all samples.
     """
 
     # Suppress the custom warnings from ChainConsumer
@@ -98,11 +121,29 @@ def create_posterior_plot(
 
     # Construct data frame with samples. We need to drop the zero-weight
     # samples because the new version of ChainConsumer can't handle them...
+    # The filtering happens on the arrays (before constructing the data
+    # frame), so that every sample is only copied once.
+    keep = weights > 0
+    samples, weights = samples[keep], weights[keep]
+
+    # If there are too many samples, resample them according to the weights
+    # (using a fixed seed to make the plots reproducible)
+    if max_plot_samples is not None and len(weights) > max_plot_samples:
+        rng = np.random.default_rng(seed=0)
+        idx = rng.choice(
+            len(weights),
+            size=max_plot_samples,
+            replace=True,
+            p=weights / np.sum(weights),
+        )
+        samples, weights = samples[idx], np.ones(max_plot_samples)
+
     df = pd.DataFrame(
-        data=np.column_stack([samples, weights]),
-        columns=list(names) + ["weight"],
+        data=np.ascontiguousarray(samples),
+        columns=list(names),
+        copy=False,
     )
-    df = df[df['weight'] > 0]
+    df["weight"] = weights
 
     # Add a chain with the actual samples
     c.add_chain(
@@ -74,6 +74,19 @@ class BasePrior(ABC):
         else:
             return float(self.distribution.pdf(theta).prod())
 
+    def evaluate_batch(self, theta: np.ndarray) -> np.ndarray:
+        """
+        Compute the prior probability for a batch of samples `theta`
+        with shape `(n, ndim)` at once. This is equivalent to calling
+        `evaluate()` for every sample, but much faster, because it
+        only requires a single (vectorized) call to the PDF.
+        Note: This assumes that the parameters are independent!
+        """
+
+        return np.asarray(
+            np.prod(self.distribution.pdf(np.atleast_2d(theta)), axis=1)
+        )
+
     def sample(self) -> np.ndarray:
         """
         Draw a sample from the prior.
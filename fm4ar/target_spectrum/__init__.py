@@ -4,6 +4,7 @@ or nested sampling.
 """
 
 from pathlib import Path
+from typing import Sequence
 
 import h5py
 import numpy as np
@@ -29,7 +30,7 @@ class TargetSpectrumConfig(BaseModel):
 
 def load_target_spectrum(
     file_path: Path,
-    index: int = 0,
+    index: int | Sequence[int] = 0,
 ) -> dict[str, np.ndarray]:
     """
     Load a target spectrum from a file.
@@ -38,22 +39,37 @@ def load_target_spectrum(
         file_path: Path to the file containing the target spectrum.
         index: Index of the target spectrum to load. Default: 0.
             This may be useful when the file contains multiple target
-            spectra, e.g., when using a proper test set.
+            spectra, e.g., when using a proper test set. If a sequence
+            of indices is given, all the corresponding spectra are read
+            at once (i.e., with a single selection per dataset).
 
     Returns:
         A dictionary containing the wavelength, flux and error bars
         (i.e., assumed noise level) of the target spectrum, as well as
-        the ground truth theta.
+        the ground truth theta. For a single `index`, all arrays are
+        1D; for a sequence of indices, `flux`, `error_bars` and `theta`
+        have shape `(len(index), ...)` (but `wlen` is always 1D).
     """
 
     file_path = expand_env_variables_in_path(file_path)
 
+    # h5py only supports increasing indices without duplicates for fancy
+    # indexing, so for a sequence of indices we read the unique (sorted)
+    # indices and then restore the requested order (and duplicates)
+    if isinstance(index, (int, np.integer)):
+        selection, inverse = int(index), None
+    else:
+        selection, inverse = np.unique(index, return_inverse=True)
+
     target = dict()
     with h5py.File(file_path, "r") as f:
         target["wlen"] = np.array(f["wlen"]).flatten()
-        target["flux"] = np.array(f["flux"][index]).flatten()
-        target["error_bars"] = np.array(f["error_bars"][index]).flatten()
-        target["theta"] = np.array(f["theta"][index]).flatten()
+        for key in ("flux", "error_bars", "theta"):
+            value = np.array(f[key][selection])
+            if inverse is None:
+                target[key] = value.flatten()
+            else:
+                target[key] = value.reshape(len(selection), -1)[inverse]
 
     for key, value in target.items():
         target[key] = value.astype(np.float32)
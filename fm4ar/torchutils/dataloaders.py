@@ -19,6 +19,7 @@ def build_dataloaders(
     n_workers: int,
     drop_last: bool = True,
     random_seed: int = 42,
+    prefetch_factor: int = 4,
 ) -> tuple[DataLoader, DataLoader]:
     """
     Build train and validation `DataLoaders` for the given `dataset`.
@@ -32,6 +33,8 @@ def build_dataloaders(
         drop_last: Whether to drop the last batch if it is smaller than
             `batch_size`. This is only used for the train loader.
         random_seed: Random seed for reproducibility.
+        prefetch_factor: Number of batches that each worker loads in
+            advance. This is only used if `n_workers > 0`.
 
     Returns:
         A 2-tuple: `(train_loader, valid_loader)`.
@@ -44,6 +47,17 @@ def build_dataloaders(
         generator=torch.Generator().manual_seed(random_seed + 0),
     )
 
+    # Keep the workers alive between epochs (instead of re-creating them, and
+    # re-opening the dataset, at the start of every epoch), and let each of
+    # them prepare `prefetch_factor` batches in advance so that the next batch
+    # is usually ready (in pinned memory) by the time the GPU needs it.
+    # Note: `prefetch_factor` must be None when loading in the main process.
+    worker_kwargs: dict = dict(
+        num_workers=n_workers,
+        persistent_workers=(n_workers > 0),
+        prefetch_factor=(prefetch_factor if n_workers > 0 else None),
+    )
+
     # Build the train loader
     train_loader = DataLoader(
         dataset=train_dataset,
@@ -51,8 +65,7 @@ def build_dataloaders(
         shuffle=True,
         drop_last=drop_last,
         pin_memory=True,
-        num_workers=n_workers,
-        persistent_workers=(n_workers > 0),
+        **worker_kwargs,
         generator=torch.Generator().manual_seed(random_seed + 1),
     )
 
@@ -63,8 +76,7 @@ def build_dataloaders(
         shuffle=False,
         drop_last=False,
         pin_memory=True,
-        num_workers=n_workers,
-        persistent_workers=(n_workers > 0),
+        **worker_kwargs,
         generator=torch.Generator().manual_seed(random_seed + 2),
     )
 
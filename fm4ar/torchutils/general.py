@@ -46,6 +46,19 @@ def get_activation_from_name(name: str) -> torch.nn.Module:
     return ActivationFunction()
 
 
+def get_amp_dtype(device: torch.device) -> torch.dtype:
+    """
+    Get the data type to use for automatic mixed precision (AMP) on
+    the given `device`. On GPUs that support it (Ampere and newer), we
+    prefer bfloat16: It has the same dynamic range as float32, so we
+    do not need a `GradScaler` to prevent gradient underflows.
+    """
+
+    if device.type == "cuda" and torch.cuda.is_bf16_supported():
+        return torch.bfloat16
+    return torch.float16
+
+
 def get_cuda_info() -> dict[str, Any]:
     """
     Get information about the CUDA devices available in the system.
@@ -11,7 +11,7 @@ from fm4ar.models.build_model import build_model
 from fm4ar.models.fmpe import FMPEModel
 from fm4ar.models.npe import NPEModel
 from fm4ar.torchutils.general import get_number_of_parameters
-from fm4ar.training.wandb import get_wandb_id
+from fm4ar.training.wandb import get_wandb_id, init_wandb
 
 
 def prepare_new(
@@ -65,7 +65,7 @@ def prepare_new(
 
         # Initialize Weights & Biases; this will produce some output to stderr
         wandb_id = get_wandb_id(experiment_dir)
-        wandb.init(
+        init_wandb(
             id=wandb_id,
             config=augmented_config,
             dir=experiment_dir,
@@ -125,7 +125,7 @@ def prepare_resume(
         print("\n\nRe-initializing Weights & Biases:", flush=True)
 
         wandb_id = get_wandb_id(experiment_dir)
-        wandb.init(
+        init_wandb(
             id=wandb_id,
             resume="must",
             dir=experiment_dir,
@@ -95,6 +95,14 @@ class StageConfig(BaseModel):
         ),
     )
     optimizer: OptimizerConfig
+    prefetch_factor: int = Field(
+        default=4,
+        ge=1,
+        description=(
+            "Number of batches that each data loader worker prepares in "
+            "advance. Ignored if the number of workers is 0."
+        ),
+    )
     scheduler: SchedulerConfig
     use_amp: bool = Field(
         ...,
@@ -103,6 +111,15 @@ class StageConfig(BaseModel):
             "this only give an advantage for FMPE models, but not NPE."
         ),
     )
+    use_compile: bool = Field(
+        default=False,
+        description=(
+            "Whether to compile the training loss with `torch.compile()`. "
+            "This fuses the many small kernels of the forward pass, which "
+            "reduces the launch overhead, but the first batches are slower "
+            "because of the compilation."
+        ),
+    )
 
 
 def initialize_stage(
@@ -161,6 +178,7 @@ def initialize_stage(
         n_workers=get_number_of_workers(stage_config.n_workers),
         drop_last=stage_config.drop_last,
         random_seed=dataset_config.random_seed + offset,
+        prefetch_factor=stage_config.prefetch_factor,
     )
 
     # Create a new optimizer and scheduler
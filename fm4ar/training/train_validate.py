@@ -9,7 +9,7 @@ import torch
 from torch.cuda.amp import GradScaler, autocast
 from torch.utils.data import DataLoader
 
-from fm4ar.torchutils.general import check_for_nans
+from fm4ar.torchutils.general import check_for_nans, get_amp_dtype
 from fm4ar.torchutils.schedulers import perform_scheduler_step
 from fm4ar.training.stages import StageConfig
 from fm4ar.utils.tracking import LossInfo
@@ -89,8 +89,23 @@ def train_epoch(
         print_freq=10,
     )
 
-    # Create scaler for automatic mixed precision
-    scaler = GradScaler(enabled=stage_config.use_amp)
+    # Create scaler for automatic mixed precision. The scaler is only needed
+    # for float16; with bfloat16 (if supported), all its methods are no-ops.
+    amp_dtype = get_amp_dtype(model.device)
+    scaler = GradScaler(
+        enabled=stage_config.use_amp and amp_dtype == torch.float16
+    )
+
+    # If desired, compile the loss function (i.e., the forward pass). We do
+    # not compile `model.network` itself, because that would change the keys
+    # of its state dict (and thus the checkpoints). With `drop_last=True`,
+    # all batches have the same shape, so we can use `dynamic=False` (else,
+    # the smaller last batch simply triggers one additional compilation).
+    loss_fn = (
+        torch.compile(model.loss, dynamic=False)
+        if stage_config.use_compile
+        else model.loss
+    )
 
     # Iterate over the batches
     batch: dict[str, torch.Tensor]
@@ -108,7 +123,7 @@ def train_epoch(
         if not stage_config.use_amp:
 
             # Compute loss and backpropagate
-            loss = model.loss(
+            loss = loss_fn(
                 theta=theta,
                 context=context,
                 **stage_config.loss_kwargs,
@@ -133,8 +148,8 @@ def train_epoch(
 
             # Compute loss and backpropagate
             # Note: Backward passes under autocast are not recommended
-            with autocast():
-                loss = model.loss(
+            with autocast(dtype=amp_dtype):
+                loss = loss_fn(
                     theta=theta,
                     context=context,
                     **stage_config.loss_kwargs,
@@ -195,13 +210,22 @@ def validate_epoch(
     # Clear the cache to reduce out-of-memory errors
     torch.cuda.empty_cache()
 
+    # Check if we need to evaluate the log probability in this epoch. If so,
+    # we keep (a copy of) the first `n_samples` samples of the first batch.
+    evaluate_logprob = (
+        stage_config.logprob_evaluation.interval is not None
+        and (model.epoch - 1) % stage_config.logprob_evaluation.interval == 0
+    )
+    n_samples = stage_config.logprob_evaluation.n_samples
+    logprob_batch: tuple[torch.Tensor, dict[str, torch.Tensor]] | None = None
+
     # -------------------------------------------------------------------------
     # Compute validation loss
     # -------------------------------------------------------------------------
 
     # We first compute only the validation loss
-    # We don't need to compute gradients for the validation set
-    with torch.no_grad() and autocast(enabled=stage_config.use_amp):
+    amp_dtype = get_amp_dtype(model.device)
+    with autocast(enabled=stage_config.use_amp, dtype=amp_dtype):
 
         # Set up a LossInfo object to keep track of the loss and times
         loss_info = LossInfo(
@@ -221,12 +245,28 @@ def validate_epoch(
             # Move data to device
             theta, context = move_batch_to_device(batch, model.device)
 
+            # Keep the samples for the log probability evaluation (we clone
+            # them so that we do not keep the entire batch in memory)
+            if evaluate_logprob and logprob_batch is None:
+                logprob_batch = (
+                    theta[:n_samples].clone(),
+                    {k: v[:n_samples].clone() for k, v in context.items()},
+                )
+
             # Compute validation loss
-            loss = model.loss(
-                theta=theta,
-                context=context,
-                **stage_config.loss_kwargs,
-            )
+            # We don't need to compute gradients for the validation set, so we
+            # can use inference mode, which is cheaper than `no_grad()` (there
+            # is no version counter and view tracking). Note that the samples
+            # for the log probability evaluation are deliberately cloned above
+            # (i.e., outside of inference mode): FMPE models need autograd to
+            # compute the divergence, which does not work for inference
+            # tensors.
+            with torch.inference_mode():
+                loss = model.loss(
+                    theta=theta,
+                    context=context,
+                    **stage_config.loss_kwargs,
+                )
             check_for_nans(loss, "validation loss")
 
             # Update loss for history and logging
@@ -247,17 +287,16 @@ def validate_epoch(
     # Optionally, we now also compute the average log probability of the true
     # parameter values. This is relatively expensive for flow matching models,
     # so we only do this for a subset of a single batch.
-    if (
-        stage_config.logprob_evaluation.interval is not None
-        and (model.epoch - 1) % stage_config.logprob_evaluation.interval == 0
-    ):
+    if evaluate_logprob and logprob_batch is not None:
 
         evaluation_start = time.time()
         print("Evaluating log probability...", end=" ", flush=True)
 
-        # Get the first batch of the dataloader and move it to the device
-        batch = next(iter(dataloader))
-        theta, context = move_batch_to_device(batch, model.device)
+        # Use the subset of the first batch that we kept from the loop above
+        # (which is already on the device) instead of creating a new iterator
+        # over the dataloader, which would restart the workers and load and
+        # transfer the batch a second time
+        theta, context = logprob_batch
 
         # Check the `model` is an FMPE model and select any additional kwargs
         # for the ODE solver that we might need. Note: We cannot directly use
@@ -271,11 +310,10 @@ def validate_epoch(
         # Compute logprob of the first `n_samples` samples of the batch
         # Note: Trying to speed up this part with AMP has not been successful
         # so far and has mostly resulted in out-of-memory errors...
-        n_samples = stage_config.logprob_evaluation.n_samples
         with torch.no_grad():
             logprob = model.log_prob_batch(
-                theta=theta[:n_samples],
-                context={k: v[:n_samples] for k, v in context.items()},
+                theta=theta,
+                context=context,
                 **extra_kwargs,
             )
 
@@ -2,8 +2,12 @@
 Utility functions for Weights & Biases (wandb).
 """
 
+import random
+import time
 from pathlib import Path
+from typing import Any
 
+import wandb
 from wandb.util import generate_id
 
 
@@ -36,3 +40,44 @@ def get_wandb_id(experiment_dir: Path) -> str:
             file.write(wandb_id)
 
     return wandb_id
+
+
+def init_wandb(
+    max_attempts: int = 5,
+    init_timeout: float = 30.0,
+    max_total_time: float = 600.0,
+    **kwargs: Any,
+) -> None:
+    """
+    Initialize Weights & Biases, retrying on (transient) network errors.
+
+    Between two attempts, we wait with an exponential backoff (plus some
+    random jitter), that is, for about 2, 4, 8, ... seconds. This means
+    that we recover quickly if the server is only briefly unavailable,
+    while still not hammering it if the problem persists.
+
+    Args:
+        max_attempts: Maximum number of attempts.
+        init_timeout: Timeout (in seconds) for every single attempt,
+            so that a hanging connection fails fast.
+        max_total_time: Maximum total time (in seconds) to spend on
+            retrying, regardless of the number of attempts.
+        **kwargs: Keyword arguments for `wandb.init()`.
+    """
+
+    kwargs.setdefault("settings", wandb.Settings(init_timeout=init_timeout))
+    start_time = time.time()
+
+    for n_failures in range(max_attempts):
+        try:
+            wandb.init(**kwargs)
+            return
+        except wandb.errors.CommError as e:
+            delay = min(300.0, 2 ** (n_failures + 1) + random.random())
+            elapsed = time.time() - start_time
+            if n_failures + 1 == max_attempts or (
+                elapsed + delay > max_total_time
+            ):
+                raise
+            print(f"wandb.init() failed ({e}), retrying in {delay:.1f}s...")
+            time.sleep(delay)
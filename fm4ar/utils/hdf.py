@@ -2,16 +2,53 @@
 Utility functions for working with HDF5 files.
 """
 
+import os
 from pathlib import Path
-from typing import Sequence
+from typing import Any, Sequence
 
 import h5py
 import numpy as np
 from tqdm import tqdm
 
 
+def get_row_chunks(
+    shape: Sequence[int],
+    dtype: np.dtype,
+    target_nbytes: int = 1_048_576,
+) -> tuple[int, ...] | None:
+    """
+    Determine a chunk shape that groups entire rows (i.e., entries
+    along the first axis) such that each chunk has about the given
+    target size. This matches the access pattern of our data loaders,
+    which always read contiguous ranges of rows.
+
+    Args:
+        shape: Shape of the dataset. The first axis is the sample axis.
+            For resizable datasets, this can be the initial shape, as
+            only the shape of a single row matters.
+        dtype: Data type of the dataset.
+        target_nbytes: Target size of each chunk in bytes. The default
+            of 1 MB matches the default size of the HDF5 chunk cache.
+
+    Returns:
+        The chunk shape, or None for scalar datasets, which cannot be
+        chunked.
+    """
+
+    if len(shape) == 0:
+        return None
+
+    row_shape = tuple(int(n) for n in shape[1:])
+    row_nbytes = max(1, int(np.prod(row_shape)) * np.dtype(dtype).itemsize)
+    chunk_rows = max(1, target_nbytes // row_nbytes)
+
+    return (chunk_rows, *row_shape)
+
+
 def save_to_hdf(
     file_path: Path,
+    compression: str | None = None,
+    driver: str | None = None,
     **kwargs: np.ndarray,
 ) -> None:
     """
@@ -19,17 +56,186 @@ def save_to_hdf(
 
     Args:
         file_path: Path to the HDF5 file.
+        compression: Compression filter (e.g., "lzf" or "gzip"). If
+            given, all non-scalar (and non-empty) arrays are chunked
+            along the rows (see `get_row_chunks()`) and compressed,
+            so that reading a subset of the rows only needs to read
+            (and decompress) the corresponding chunks. Default: None,
+            meaning that the arrays are stored contiguously.
+        driver: HDF5 file driver that `h5py` should use. With "core",
+            the whole file is built in memory and written to disk in
+            one go when it is closed. This is useful for many small
+            files (e.g., in tests), which would otherwise need many
+            small writes. Default: None (i.e., h5py's default driver).
         kwargs: Arrays to save.
     """
 
-    # Ensure that the file exists and is empty
-    with h5py.File(file_path, "w") as _:
-        pass
+    # Create (or truncate) the file and save the arrays one by one
+    with h5py.File(file_path, "w", driver=driver) as f:
+        for key, value in kwargs.items():
+
+            # Determine the chunking (only needed if we compress the data)
+            chunks = (
+                None if compression is None or value.size == 0
+                else get_row_chunks(shape=value.shape, dtype=value.dtype)
+            )
+            if chunks is None:
+                f.create_dataset(name=key, data=value, dtype=value.dtype)
+                continue
+
+            f.create_dataset(
+                name=key,
+                data=value,
+                dtype=value.dtype,
+                chunks=(min(chunks[0], value.shape[0]), *chunks[1:]),
+                compression=compression,
+                shuffle=True,
+            )
+
+
+def get_storage_dtype(
+    array: np.ndarray,
+    dtype: np.dtype | type | str,
+    block_rows: int = 1024,
+) -> np.dtype:
+    """
+    Check if the given (floating point) `array` can be stored as the
+    (usually smaller) `dtype` without overflow or loss of precision,
+    and return the data type in which the array should be saved.
+
+    Values whose magnitude is larger than the maximum of `dtype` would
+    become inf, and non-zero values whose magnitude is below `tiny` of
+    `dtype` would become subnormal (i.e., lose precision) or even be
+    rounded to zero. In both cases, we print a warning and fall back to
+    the data type of the `array`, so that no results are lost because
+    of the choice of storage format. NaN values are ignored.
+
+    Args:
+        array: Array that should be saved.
+        dtype: Requested (floating point) data type for storing.
+        block_rows: Number of rows that are checked at once. This
+            limits the size of the temporary arrays, so that we never
+            allocate a second full-size copy of the `array`.
+
+    Returns:
+        Either `dtype`, or the data type of the `array`.
+    """
+
+    dtype = np.dtype(dtype)
+    if dtype == array.dtype or array.size == 0:
+        return dtype
+
+    # Determine the range of the absolute values, one block of rows at a time
+    # (for NaN values, both `isnan()` and `> 0` are False, so they are ignored)
+    max_abs, min_abs = 0.0, np.inf
+    for start in range(0, len(array), block_rows):
+        block = np.abs(array[start : start + block_rows])
+        max_abs = max(
+            max_abs, float(np.max(block, initial=0, where=~np.isnan(block)))
+        )
+        min_abs = min(
+            min_abs, float(np.min(block, initial=np.inf, where=block > 0))
+        )
+
+    finfo = np.finfo(dtype)
+    if max_abs > finfo.max or min_abs < finfo.tiny:
+        print(
+            f"Warning: Absolute values between {min_abs:.3g} and "
+            f"{max_abs:.3g} cannot be stored as {dtype} without loss of "
+            f"precision! Falling back to {array.dtype}."
+        )
+        return array.dtype
+
+    return dtype
+
+
+def read_rows_from_hdf(
+    dataset: h5py.Dataset,
+    n_rows: int | None = None,
+    dtype: np.dtype | type | str | None = None,
+    block_nbytes: int = 64 * 1024**2,
+) -> np.ndarray:
+    """
+    Read the first `n_rows` rows of an HDF5 dataset into a new array.
+
+    Instead of `np.array(dataset[:n_rows])`, which first lets h5py
+    allocate an array for the selection and then copies it again, we
+    allocate the output array once and let HDF5 write into it directly.
+
+    Args:
+        dataset: HDF5 dataset from which to read.
+        n_rows: Number of rows (i.e., entries along the first axis) to
+            read. If None (or larger than the dataset), read all rows.
+        dtype: Data type of the output array. If this differs from the
+            data type of the dataset, HDF5 converts the values while
+            reading, so no full-size array of the original data type is
+            ever allocated. If None, use the data type of the dataset.
+        block_nbytes: Approximate number of bytes per read for chunked
+            datasets (see `get_aligned_block_rows()`).
+
+    Returns:
+        Array with shape `(n_rows, *dataset.shape[1:])`.
+    """
+
+    dtype = dataset.dtype if dtype is None else np.dtype(dtype)
+
+    # Scalar datasets do not have any rows that we could select
+    if dataset.ndim == 0:
+        output = np.empty(shape=(), dtype=dtype)
+        dataset.read_direct(output)
+        return output
 
-    # Save the arrays to the HDF5 file (one by one)
-    for key, value in kwargs.items():
-        with h5py.File(file_path, "a") as f:
-            f.create_dataset(name=key, data=value, dtype=value.dtype)
+    # Determine the number of rows that we can actually read
+    n_total = dataset.shape[0]
+    n_rows = n_total if n_rows is None else min(max(n_rows, 0), n_total)
+
+    # Allocate the output array and read the data directly into it.
+    # For chunked datasets, we read in blocks whose boundaries are aligned
+    # with the chunk boundaries along the first axis. This way, no chunk is
+    # ever needed by two different reads (which, for chunks that do not fit
+    # into the chunk cache, means reading and decompressing them twice), and
+    # the chunk cache only ever has to hold the chunks of a single block.
+    output = np.empty(shape=(n_rows, *dataset.shape[1:]), dtype=dtype)
+    block_rows = get_aligned_block_rows(dataset, block_nbytes)
+    for start in range(0, n_rows, block_rows):
+        stop = min(start + block_rows, n_rows)
+        dataset.read_direct(
+            output,
+            source_sel=np.s_[start:stop],
+            dest_sel=np.s_[start:stop],
+        )
+
+    return output
+
+
+def get_aligned_block_rows(
+    dataset: h5py.Dataset,
+    block_nbytes: int = 64 * 1024**2,
+) -> int:
+    """
+    Determine the number of rows per read such that every read is
+    aligned with the chunk boundaries along the first axis, and covers
+    roughly `block_nbytes` bytes (but at least one "stripe" of chunks).
+
+    Args:
+        dataset: HDF5 dataset (with at least one dimension).
+        block_nbytes: Target size of every read in bytes.
+
+    Returns:
+        Number of rows per read (a multiple of the number of rows per
+        chunk for chunked datasets; all rows for contiguous datasets).
+    """
+
+    n_total = max(1, dataset.shape[0])
+    if dataset.chunks is None:
+        return n_total
+
+    chunk_rows = dataset.chunks[0]
+    row_size = int(np.prod(dataset.shape[1:]))
+    row_nbytes = max(1, row_size * dataset.dtype.itemsize)
+    n_stripes = max(1, block_nbytes // (chunk_rows * row_nbytes))
+
+    return min(n_total, chunk_rows * n_stripes)
 
 
 def load_from_hdf(
@@ -59,9 +265,9 @@ def load_from_hdf(
                 data[key] = np.empty(shape=())
                 continue
             if idx is None:
-                data[key] = np.array(f[key], dtype=f[key].dtype)
+                data[key] = read_rows_from_hdf(f[key])
             else:
-                data[key] = np.array(f[key][idx], dtype=f[key].dtype)
+                data[key] = np.asarray(f[key][idx], dtype=f[key].dtype)
 
     return data
 
@@ -74,6 +280,7 @@ def merge_hdf_files(
     singleton_keys: Sequence[str] = ("wlen",),
     delete_after_merge: bool = False,
     show_progressbar: bool = False,
+    compression: str | None = None,
 ) -> None:
     """
     Merge the HDF files in the given directory and save the results.
@@ -93,6 +300,8 @@ def merge_hdf_files(
             after merging. Default: False.
         show_progressbar: Whether to show a progress bar for the loop
             over the HDF files that we merge. Default: False.
+        compression: Compression filter for the merged (non-singleton)
+            datasets, e.g., "lzf" or "gzip". Default: None.
     """
 
     # Collect the HDF files
@@ -110,6 +319,18 @@ def merge_hdf_files(
             if (keys is None or key in keys) and (key not in singleton_keys):
                 keys_shapes_dtypes[key] = (f[key].shape, f[key].dtype)
 
+    # The dtypes can differ between the files (e.g., if some of the spectra
+    # could not be stored as float16, see `get_storage_dtype()`), so we use
+    # the "largest" dtype of every key to never lose any information. This
+    # only needs to read the metadata of the files, not the data itself.
+    # Empty arrays are skipped when merging, so they are also ignored here.
+    for file_path in file_paths[1:]:
+        with h5py.File(file_path, "r") as f:
+            for key, (shape, dtype) in keys_shapes_dtypes.items():
+                if f[key].size > 0:
+                    dtype = np.promote_types(dtype, f[key].dtype)
+                    keys_shapes_dtypes[key] = (shape, dtype)
+
     # Prepare output HDF file and copy singleton keys
     with h5py.File(output_file_path, "w") as f:
 
@@ -123,12 +344,17 @@ def merge_hdf_files(
                 )
 
         # Initialize datasets for the other keys
+        # The chunks are aligned with the rows (= samples), because this is
+        # how the data loaders read the data (i.e., `f[key][:n_samples]`).
         for key, (shape, dtype) in keys_shapes_dtypes.items():
             f.create_dataset(
                 name=key,
                 shape=(0, *shape[1:]),
                 maxshape=(None, *shape[1:]),
                 dtype=dtype,
+                chunks=get_row_chunks(shape=shape, dtype=dtype),
+                compression=compression,
+                shuffle=compression is not None,
             )
 
     # Prepare progress bar
@@ -160,3 +386,182 @@ def merge_hdf_files(
     if delete_after_merge:
         for file_path in file_paths:
             file_path.unlink()
+
+
+def rechunk_hdf_file(
+    input_file_path: Path,
+    output_file_path: Path,
+    compression: str | None = "lzf",
+    target_nbytes: int = 1_048_576,
+) -> None:
+    """
+    Copy an HDF file such that all datasets are chunked along the rows
+    and (optionally) compressed. This can be used to convert existing
+    datasets (e.g., a `merged.hdf` file that was created before the
+    chunking in `merge_hdf_files()` was introduced).
+
+    Args:
+        input_file_path: Path to the source HDF file.
+        output_file_path: Path to the output HDF file.
+        compression: Compression filter to use (e.g., "lzf", "gzip").
+            Default: "lzf" (fast, but only available in h5py).
+        target_nbytes: Target size of each chunk in bytes.
+    """
+
+    with (
+        h5py.File(input_file_path, "r") as src,
+        h5py.File(output_file_path, "w") as dst,
+    ):
+        for key in src:
+
+            # Scalar datasets cannot be chunked, so we simply copy them
+            chunks = get_row_chunks(
+                shape=src[key].shape,
+                dtype=src[key].dtype,
+                target_nbytes=target_nbytes,
+            )
+            if chunks is None or src[key].size == 0:
+                dst.create_dataset(name=key, data=src[key][()])
+                continue
+
+            # Create the output dataset and copy the data chunk by chunk
+            dst.create_dataset(
+                name=key,
+                shape=src[key].shape,
+                dtype=src[key].dtype,
+                chunks=(min(chunks[0], src[key].shape[0]), *chunks[1:]),
+                compression=compression,
+                shuffle=compression is not None,
+            )
+            for start in range(0, src[key].shape[0], chunks[0]):
+                stop = start + chunks[0]
+                dst[key][start:stop] = src[key][start:stop]
+
+
+class LazyHDFArray:
+    """
+    Read-only, array-like view of (the first `n_rows` rows of) an HDF5
+    dataset, which only reads the rows that are actually requested.
+
+    This allows training on datasets that do not fit into memory: the
+    `SpectraDataset` only ever indexes its arrays with single indices,
+    so we never need to materialize the full dataset. The file is
+    opened lazily (and re-opened in every process that uses the array),
+    because h5py file handles cannot be shared between the workers of
+    a `DataLoader`.
+    """
+
+    def __init__(
+        self,
+        file_path: Path,
+        key: str,
+        n_rows: int | None = None,
+        dtype: np.dtype | type | str | None = None,
+        rdcc_nbytes: int = 64 * 1024**2,
+        rdcc_nslots: int = 10_007,
+    ) -> None:
+        """
+        Args:
+            file_path: Path to the HDF5 file.
+            key: Name of the dataset in the HDF5 file.
+            n_rows: Number of rows (i.e., entries along the first axis)
+                to expose. If None (or larger than the dataset), expose
+                all rows.
+            dtype: Data type of the returned arrays. If None, use the
+                data type of the dataset.
+            rdcc_nbytes: Size of the HDF5 chunk cache (in bytes). The
+                default (64 MB instead of 1 MB) ensures that multiple
+                chunks can be cached when reading rows at random.
+            rdcc_nslots: Number of slots in the chunk cache hash table.
+        """
+
+        self.file_path = Path(file_path)
+        self.key = key
+        self.rdcc_nbytes = rdcc_nbytes
+        self.rdcc_nslots = rdcc_nslots
+
+        with h5py.File(self.file_path, "r") as f:
+            shape = f[key].shape
+            self.dtype = f[key].dtype if dtype is None else np.dtype(dtype)
+
+        if len(shape) == 0:
+            raise ValueError("LazyHDFArray does not support scalar datasets!")
+        n_total = shape[0]
+        n_rows = n_total if n_rows is None else min(max(n_rows, 0), n_total)
+        self.shape: tuple[int, ...] = (n_rows, *shape[1:])
+
+        # The file handle is created on first access; see `_get_dataset()`
+        self._file: h5py.File | None = None
+        self._pid: int | None = None
+
+    @property
+    def ndim(self) -> int:
+        return len(self.shape)
+
+    def __len__(self) -> int:
+        return self.shape[0]
+
+    def __getstate__(self) -> dict:
+        # Open file handles cannot be pickled (e.g., when the array is sent
+        # to a spawned DataLoader worker), so we drop it from the state
+        state = self.__dict__.copy()
+        state["_file"] = None
+        state["_pid"] = None
+        return state
+
+    def __array__(self, dtype: np.dtype | None = None) -> np.ndarray:
+        array = self[:]
+        return array if dtype is None else array.astype(dtype)
+
+    def _get_dataset(self) -> Any:
+        """
+        Return the HDF5 dataset, opening the file if this has not been
+        done yet in the current process.
+        """
+
+        if self._file is None or self._pid != os.getpid():
+            self._file = h5py.File(
+                self.file_path,
+                "r",
+                rdcc_nbytes=self.rdcc_nbytes,
+                rdcc_nslots=self.rdcc_nslots,
+            )
+            self._pid = os.getpid()
+
+        # `astype()` lets HDF5 convert the values while reading
+        dataset = self._file[self.key]
+        if dataset.dtype == self.dtype:
+            return dataset
+        return dataset.astype(self.dtype)
+
+    def __getitem__(self, idx: int | slice | np.ndarray) -> np.ndarray:
+        """
+        Read the rows selected by `idx`, which can be a single integer,
+        a slice, or an array of integer indices.
+        """
+
+        n_rows = len(self)
+
+        # Contiguous slices can be passed on to h5py directly
+        if isinstance(idx, slice):
+            start, stop, step = idx.indices(n_rows)
+            if step == 1:
+                return np.asarray(self._get_dataset()[start:max(start, stop)])
+            idx = np.arange(start, stop, step)
+
+        # Single index: read exactly one row
+        if np.ndim(idx) == 0:
+            i = int(idx)  # type: ignore
+            if not -n_rows <= i < n_rows:
+                raise IndexError(f"Index {i} is out of bounds!")
+            return np.asarray(self._get_dataset()[i % n_rows])
+
+        # Array of indices: h5py requires these to be sorted and unique, and
+        # reading in sorted order also keeps the access chunk-aligned
+        idx = np.asarray(idx, dtype=np.int64)
+        if np.any((idx < -n_rows) | (idx >= n_rows)):
+            raise IndexError("Index array contains out-of-bounds indices!")
+        unique_idx, inverse = np.unique(idx % n_rows, return_inverse=True)
+        if len(unique_idx) == 0:
+            return np.empty((0, *self.shape[1:]), dtype=self.dtype)
+        return np.asarray(self._get_dataset()[unique_idx])[inverse]
@@ -3,6 +3,60 @@ Utility functions for multiprocessing.
 """
 
 import os
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+
+def copy_to_shared_memory(array: np.ndarray) -> SharedMemory:
+    """
+    Create a new block of shared memory and copy the given `array`
+    into it. Worker processes can then attach to the block by its name
+    (see `get_shared_array()`) and read from or write to the array
+    without any pickling of the data.
+
+    Note: The caller is responsible for calling `close()` and `unlink()`
+    on the returned `SharedMemory` object once it is no longer needed.
+
+    Args:
+        array: The array to copy into shared memory.
+
+    Returns:
+        The `SharedMemory` object holding a copy of `array`.
+    """
+
+    # SharedMemory does not support a size of 0, so we allocate at least
+    # one byte (the size of the block is not used to determine the shape)
+    shm = SharedMemory(create=True, size=max(1, array.nbytes))
+    get_shared_array(shm, array.shape, array.dtype)[...] = array
+
+    return shm
+
+
+def get_shared_array(
+    shm: SharedMemory,
+    shape: tuple[int, ...],
+    dtype: np.dtype | type | str,
+) -> np.ndarray:
+    """
+    Get a view of the array that is stored in the given shared memory.
+    In a worker process, use `SharedMemory(name=...)` to attach to the
+    block first, and keep a reference to it for as long as the view is
+    used (otherwise, the buffer is released when `shm` is collected).
+
+    Note: As long as a view exists, `shm.close()` fails, so views in the
+    main process should be short-lived (e.g., followed by `.copy()`).
+
+    Args:
+        shm: The `SharedMemory` object holding the array.
+        shape: Shape of the array.
+        dtype: Data type of the array.
+
+    Returns:
+        A numpy array that uses the shared memory as its buffer.
+    """
+
+    return np.ndarray(shape=shape, dtype=dtype, buffer=shm.buf)
 
 
 def get_number_of_available_cores(default: int = 8) -> int:
@@ -0,0 +1,111 @@
+"""
+Utility functions for storing datasets in the `zarr` format.
+
+Compared to HDF5, zarr stores every chunk in a separate file, and does
+not require a global lock. This means that chunks can be compressed in
+parallel (Blosc uses multiple threads) and that multiple workers can
+read from the same store concurrently.
+
+Note: `zarr` is an optional dependency (`pip install fm4ar[zarr]`),
+so it is only ever imported inside the functions in this module.
+"""
+
+from pathlib import Path
+from typing import Any
+
+import h5py
+import numpy as np
+
+from fm4ar.utils.hdf import get_row_chunks
+
+
+def convert_hdf_to_zarr(
+    input_file_path: Path,
+    output_dir_path: Path,
+    target_nbytes: int = 1_048_576,
+    cname: str = "lz4",
+    clevel: int = 3,
+) -> None:
+    """
+    Copy all datasets from an HDF file into a (directory-based) zarr
+    store, chunked along the rows and compressed with Blosc.
+
+    Args:
+        input_file_path: Path to the source HDF file.
+        output_dir_path: Path to the output zarr store (usually with
+            the suffix `.zarr`, which is what `load_dataset()` uses to
+            decide which backend to use).
+        target_nbytes: Target size of each chunk in bytes.
+        cname: Name of the compressor that Blosc should use.
+        clevel: Compression level for Blosc.
+    """
+
+    import zarr
+    from numcodecs import Blosc
+
+    compressor = Blosc(cname=cname, clevel=clevel, shuffle=Blosc.BITSHUFFLE)
+    root = zarr.open_group(store=str(output_dir_path), mode="w")
+
+    with h5py.File(input_file_path, "r") as src:
+        for key in src:
+
+            # Scalar (and empty) datasets are simply copied
+            chunks = get_row_chunks(
+                shape=src[key].shape,
+                dtype=src[key].dtype,
+                target_nbytes=target_nbytes,
+            )
+            if chunks is None or src[key].size == 0:
+                root.array(name=key, data=src[key][()])
+                continue
+
+            # Create the output array and copy the data chunk by chunk
+            dst = root.create_dataset(
+                name=key,
+                shape=src[key].shape,
+                dtype=src[key].dtype,
+                chunks=(min(chunks[0], src[key].shape[0]), *chunks[1:]),
+                compressor=compressor,
+            )
+            for start in range(0, src[key].shape[0], chunks[0]):
+                stop = start + chunks[0]
+                dst[start:stop] = src[key][start:stop]
+
+
+def open_zarr_store(dir_path: Path) -> Any:
+    """
+    Open a zarr store (read-only) and return the root group.
+    """
+
+    import zarr
+
+    return zarr.open_group(store=str(dir_path), mode="r")
+
+
+def read_rows_from_zarr(
+    array: Any,
+    n_rows: int | None = None,
+    dtype: np.dtype | type | str | None = None,
+) -> np.ndarray:
+    """
+    Read the first `n_rows` rows of a zarr array into a new array.
+    This is the zarr equivalent of `read_rows_from_hdf()`.
+
+    Args:
+        array: zarr array from which to read.
+        n_rows: Number of rows (i.e., entries along the first axis) to
+            read. If None (or larger than the array), read all rows.
+        dtype: Data type of the output array. If None, use the data
+            type of the zarr array.
+
+    Returns:
+        Array with shape `(n_rows, *array.shape[1:])`.
+    """
+
+    if array.ndim == 0:
+        return np.asarray(array[()], dtype=dtype)
+
+    n_total = array.shape[0]
+    n_rows = n_total if n_rows is None else min(max(n_rows, 0), n_total)
+
+    return np.asarray(array[:n_rows], dtype=dtype)
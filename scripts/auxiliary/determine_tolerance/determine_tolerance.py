@@ -107,20 +107,31 @@ def draw_samples_from_fmpe_model(config: dict) -> dict[float, torch.Tensor]:
             )
 
             # Draw samples (with a progress bar)
+            # The samples are copied chunk by chunk into a preallocated output
+            # tensor in pinned memory (instead of collecting the chunks in a
+            # list and concatenating them), which avoids an extra copy of all
+            # samples and allows non-blocking copies from the GPU.
             print(f"Drawing samples with `{tolerance=:.5f}`:\n", flush=True)
-            list_of_chunks = []
+            dim_theta = int(model.config["model"]["dim_theta"])
+            samples[tolerance] = torch.empty(
+                (n_chunks * chunk_size, dim_theta),
+                dtype=torch.float32,
+                pin_memory=True,
+            )
             with torch.no_grad():
-                for _ in trange(n_chunks):
+                for i in trange(n_chunks):
                     with autocast(enabled=config["fmpe_model"]["use_amp"]):
                         chunk = model.sample_batch(
                             context=chunk_context,
                             tolerance=tolerance,
                         )
-                    list_of_chunks.append(chunk.cpu())
+                    samples[tolerance][
+                        i * chunk_size: (i + 1) * chunk_size
+                    ].copy_(chunk, non_blocking=True)
+            torch.cuda.synchronize()
 
-            # Combine samples and save them to an HDF file
+            # Save the samples to an HDF file
             print("\nSaving samples to HDF...", end=" ", flush=True)
-            samples[tolerance] = torch.cat(list_of_chunks, dim=0)
             save_to_hdf(
                 file_path=samples_file_path,
                 samples=samples[tolerance].numpy(),
@@ -210,9 +221,12 @@ def train_discriminator_model(
         print(f"[{epoch + 1:3d}] | ", end="")
 
         # Train for one epoch
+        # The losses and matches are accumulated on the GPU and only copied
+        # to the CPU once per epoch: calling `.item()` for every batch would
+        # force a device synchronization (and a transfer) for every batch.
         discriminator.train()
-        losses = 0.0
-        matches = 0.0
+        losses = torch.zeros((), device="cuda")
+        matches = torch.zeros((), device="cuda")
         for x, y_true in train_loader:
             x = x.to("cuda", non_blocking=True)
             y_true = y_true.to("cuda", non_blocking=True)
@@ -221,12 +235,12 @@ def train_discriminator_model(
             loss = criterion(y_pred, y_true)
             loss.backward()
             optimizer.step()
-            losses += loss.item()
+            losses += loss.detach()
             scheduler.step()
             y_pred = (torch.sigmoid(y_pred) > 0.5).float()
-            matches += (y_pred == y_true).float().mean().item()
-        train_loss = losses / len(train_loader)
-        accuracy = matches / len(train_loader)
+            matches += (y_pred == y_true).float().mean()
+        train_loss = losses.item() / len(train_loader)
+        accuracy = matches.item() / len(train_loader)
         if accuracy > max_train_accuracy:
             max_train_accuracy = accuracy
         print(f"train_loss: {train_loss:.4f} | ", end="")
@@ -234,18 +248,18 @@ def train_discriminator_model(
 
         # Evaluate on the test set
         discriminator.eval()
-        losses = 0.0
-        matches = 0.0
-        with torch.no_grad():
+        losses = torch.zeros((), device="cuda")
+        matches = torch.zeros((), device="cuda")
+        with torch.inference_mode():
             for x, y_true in valid_loader:
                 x = x.to("cuda", non_blocking=True)
                 y_true = y_true.to("cuda", non_blocking=True)
                 y_pred = discriminator(x)
-                losses += criterion(y_pred, y_true).item()
+                losses += criterion(y_pred, y_true)
                 y_pred = (torch.sigmoid(y_pred) > 0.5).float()
-                matches += (y_pred == y_true).float().mean().item()
-        valid_loss = losses / len(valid_loader)
-        accuracy = matches / len(valid_loader)
+                matches += (y_pred == y_true).float().mean()
+        valid_loss = losses.item() / len(valid_loader)
+        accuracy = matches.item() / len(valid_loader)
         if accuracy > max_valid_accuracy:
             max_valid_accuracy = accuracy
         print(f"valid_loss: {valid_loss:.4f} | ", end="")
@@ -217,21 +217,45 @@ if __name__ == "__main__":
     # Evaluate the log-probability of the samples
     print("Evaluating log-probabilities:", flush=True)
 
+    # The results are written into a preallocated output array (using a
+    # write cursor), instead of collecting and concatenating the chunks
+    batch_size = 8192
     dataset = TensorDataset(torch.from_numpy(samples).float())
-    dataloader = DataLoader(dataset, batch_size=8192)
-    log_prob_chunks = []
+    dataloader = DataLoader(
+        dataset,
+        batch_size=batch_size,
+        shuffle=False,
+        num_workers=0,
+        pin_memory=True,  # allows for non-blocking transfers to the GPU
+    )
+    # The log-probs are collected in a preallocated output tensor in pinned
+    # memory, so that every chunk can be copied with a non-blocking transfer
+    # and we only need to synchronize with the GPU once after the loop
+    log_probs = torch.empty(len(dataset), dtype=torch.float32, pin_memory=True)
+    n_filled = 0
+
+    # The context is the same for all batches, so we move it to the device
+    # (and expand it to the full batch size) only once, and then use a slice
+    # of it for every batch (see also `draw_samples_from_ml_model()`).
+    device_context = (
+        None if context is None else {
+            k: v.to(device).expand(min(batch_size, len(dataset)), -1)
+            for k, v in context.items()
+        }
+    )
 
     for batch in tqdm(dataloader, total=len(dataloader), ncols=80):
 
-        # Scale the samples to the correct range
-        theta = theta_scaler.forward_tensor(batch[0]).to(device)
+        # Scale the samples to the correct range (directly on the device)
+        theta = theta_scaler.forward_tensor(
+            batch[0].to(device, non_blocking=True)
+        )
 
         # FMPE / NPE uses `log_prob_batch`
-        if model_type in ["fmpe", "npe"]:
+        if device_context is not None:
             with torch.no_grad():
                 chunk_context = {
-                    k: v.repeat(len(theta), 1).to(device, non_blocking=True)
-                    for k, v in context.items()
+                    k: v[:len(theta)] for k, v in device_context.items()
                 }
                 with torch.cuda.amp.autocast(enabled=use_amp):
                     chunk = model.log_prob_batch(
@@ -239,17 +263,24 @@ if __name__ == "__main__":
                         context=chunk_context,
                         **model_kwargs,
                     )
-                    log_prob_chunks.append(chunk.cpu().numpy())
-                    del chunk
 
         # Unconditional flow uses `log_prob`
+        # Unlike FMPE models, this does not need autograd internally, so we
+        # can use the (cheaper) inference mode instead of `no_grad()`
         else:
-            with torch.no_grad():
+            with torch.inference_mode():
                 chunk = model.log_prob(theta=theta)
-                log_prob_chunks.append(chunk.cpu().numpy())
-                del chunk
 
-    log_probs = np.concatenate(log_prob_chunks, axis=0).flatten()
+        # Copy the chunk into the output array and advance the cursor
+        log_probs[n_filled:n_filled + len(theta)].copy_(
+            chunk.flatten(),
+            non_blocking=True,
+        )
+        n_filled += len(theta)
+        del chunk
+
+    # Wait for all copies to finish before we use the results
+    torch.cuda.synchronize()
     print()
 
     # -------------------------------------------------------------------------
@@ -280,7 +311,7 @@ if __name__ == "__main__":
         hdf_file.create_dataset("weights", data=weights)
 
         # Store the log-probabilities that we just evaluated
-        hdf_file.create_dataset("log_probs", data=log_probs)
+        hdf_file.create_dataset("log_probs", data=log_probs.numpy())
 
     print("Done!\n", flush=True)
     print(f"Output file path:\n{file_path}", flush=True)
@@ -135,8 +135,15 @@ if __name__ == "__main__":
             list_of_flux.append(flux)
 
     # Convert lists to arrays
-    theta = np.array(list_of_theta, dtype=np.float32)
-    flux = np.array(list_of_flux, dtype=np.float32)
+    # All elements are arrays of the same shape, so we can use `np.stack()`,
+    # which (unlike `np.array()`) does not need to infer the shape from the
+    # nested sequence, and allocates the output (as float32) only once.
+    if list_of_theta:
+        theta = np.stack(list_of_theta, dtype=np.float32)
+        flux = np.stack(list_of_flux, dtype=np.float32)
+    else:
+        theta = np.empty((0, len(prior.names)), dtype=np.float32)
+        flux = np.empty((0, len(wlen)), dtype=np.float32)
 
     print(f"\nNumber of successful simulations: {len(theta)}\n", flush=True)
 
@@ -18,6 +18,13 @@ def get_cli_arguments() -> argparse.Namespace:
     """
 
     parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--compression",
+        type=str,
+        default="lzf",
+        choices=["none", "lzf", "gzip"],
+        help="Compression filter for the merged datasets (default: lzf).",
+    )
     parser.add_argument(
         "--delete-after-merge",
         default=False,
@@ -67,6 +74,7 @@ if __name__ == "__main__":
         singleton_keys=("wlen", ),
         delete_after_merge=args.delete_after_merge,
         show_progressbar=True,
+        compression=None if args.compression == "none" else args.compression,
     )
 
     # Print total number of spectra after merging
@@ -108,16 +108,21 @@ if __name__ == "__main__":
     rng = np.random.default_rng(seed=args.random_seed + offset)
 
     # Keep track of the results
+    # The results are written into preallocated arrays (instead of lists that
+    # need to be stacked at the end, which requires a full extra copy). The
+    # arrays for the fluxes and noises are only allocated once we know the
+    # number of wavelength bins, that is, after the first simulation.
     wlen = np.empty(0)
-    thetas: list[np.ndarray] = []
-    fluxes: list[np.ndarray] = []
-    noises: list[np.ndarray] = []
-    sigmas: list[float] = []
+    thetas = np.empty((args.n_spectra, len(prior.names)), dtype=np.float32)
+    fluxes = np.empty((args.n_spectra, 0), dtype=np.float32)
+    noises = np.empty((args.n_spectra, 0), dtype=np.float32)
+    sigmas = np.empty(args.n_spectra, dtype=np.float32)
+    n_filled = 0
 
     # Simulate spectra until the desired number of spectra is reached
     print("Generating test set:", flush=True)
     with tqdm(total=args.n_spectra, ncols=80) as progressbar:
-        while len(thetas) < args.n_spectra:
+        while n_filled < args.n_spectra:
 
             # Sample parameters from the prior (in the unit cube)
             if args.theta_mode == "default":
@@ -152,22 +157,30 @@ if __name__ == "__main__":
             sigma = rng.uniform(args.min_sigma, args.max_sigma)
             noise = rng.normal(0, sigma, size=flux.shape).astype(np.float32)
 
-            # Add noise to the spectrum
-            noisy_flux = flux + noise
-
-            # Store the results
-            thetas.append(theta)
-            fluxes.append(noisy_flux)
-            noises.append(noise)
-            sigmas.append(sigma)
+            # Allocate the arrays for the fluxes and noises (only once, based
+            # on the first spectrum); all spectra must have the same bins
+            if n_filled == 0:
+                fluxes = np.empty((args.n_spectra, len(flux)), np.float32)
+                noises = np.empty((args.n_spectra, len(flux)), np.float32)
+            elif fluxes.shape[1] != len(flux):
+                raise ValueError(
+                    f"Number of bins ({len(flux)}) does not match the one of "
+                    f"the previous spectra ({fluxes.shape[1]})!"
+                )
+
+            # Store the results (and add the noise to the spectrum)
+            thetas[n_filled] = theta
+            np.add(flux, noise, out=fluxes[n_filled])
+            noises[n_filled] = noise
+            sigmas[n_filled] = sigma
+            n_filled += 1
 
             # Update progress bar
             progressbar.update(1)
 
     # Construct error bars from the noise level for each spectrum
-    error_bars = np.array(
-        [np.full_like(wlen, sigma, dtype=np.float32) for sigma in sigmas]
-    )
+    # This is only a (read-only) broadcasted view and does not copy anything
+    error_bars = np.broadcast_to(sigmas[:, None], fluxes.shape)
 
     # Gather meta-information to save to HDF file (as attributes)
     n_bins = len(wlen)
@@ -191,11 +204,11 @@ if __name__ == "__main__":
     with h5py.File(file_path, "w") as f:
         f.attrs.update(metadata)
         f.create_dataset("wlen", data=wlen.reshape(1, -1))
-        f.create_dataset("flux", data=np.array(fluxes), dtype=np.float32)
+        f.create_dataset("flux", data=fluxes, dtype=np.float32)
         f.create_dataset("error_bars", data=error_bars, dtype=np.float32)
-        f.create_dataset("noise", data=np.array(noises), dtype=np.float32)
-        f.create_dataset("theta", data=np.array(thetas), dtype=np.float32)
-        f.create_dataset("sigma", data=np.array(sigmas), dtype=np.float32)
+        f.create_dataset("noise", data=noises, dtype=np.float32)
+        f.create_dataset("theta", data=thetas, dtype=np.float32)
+        f.create_dataset("sigma", data=sigmas, dtype=np.float32)
     print("Done!\n")
 
     print("Results saved to:\n", file_path, flush=True)
@@ -7,11 +7,14 @@ for creating reference posteriors).
 import argparse
 import sys
 import time
+from multiprocessing import Pool
+from multiprocessing.shared_memory import SharedMemory
 from pathlib import Path
 from socket import gethostname
+from typing import Any
 
 import numpy as np
-from p_tqdm import p_map
+from tqdm import tqdm
 
 from fm4ar.importance_sampling.config import (
     ImportanceSamplingConfig,
@@ -28,7 +31,12 @@ from fm4ar.priors import get_prior
 from fm4ar.simulators import get_simulator
 from fm4ar.target_spectrum import load_target_spectrum
 from fm4ar.torchutils.general import get_cuda_info
-from fm4ar.utils.hdf import load_from_hdf, merge_hdf_files, save_to_hdf
+from fm4ar.utils.hdf import (
+    get_storage_dtype,
+    load_from_hdf,
+    merge_hdf_files,
+    save_to_hdf,
+)
 from fm4ar.utils.htcondor import (
     DAGManFile,
     HTCondorConfig,
@@ -36,7 +44,11 @@ from fm4ar.utils.htcondor import (
     condor_submit_dag,
     create_submission_file,
 )
-from fm4ar.utils.multiproc import get_number_of_available_cores
+from fm4ar.utils.multiproc import (
+    copy_to_shared_memory,
+    get_number_of_available_cores,
+    get_shared_array,
+)
 from fm4ar.utils.paths import expand_env_variables_in_path
 
 
@@ -216,6 +228,55 @@ def backup_target_spectrum(
         save_to_hdf(file_path=file_path, **target_spectrum)
 
 
+# Simulator instance and shared arrays of the current worker process (see
+# `init_worker()`). We need to keep references to the `SharedMemory` objects
+# for as long as we use the arrays that are backed by them.
+_simulator: Any = None
+_shared_memory: list[SharedMemory] = []
+_theta: np.ndarray
+_flux: np.ndarray
+
+
+def init_worker(
+    simulator_config: Any,
+    theta_spec: tuple[str, tuple[int, ...], str],
+    flux_spec: tuple[str, tuple[int, ...], str],
+) -> None:
+    """
+    Initializer for the worker processes of the simulation pool: Every
+    worker constructs its own simulator only once (instead of pickling
+    it, or re-creating it, for every task), and attaches to the shared
+    memory that holds the input `theta` and the output `flux` arrays.
+    Each spec is a tuple `(name, shape, dtype)`.
+    """
+
+    global _simulator, _theta, _flux
+    _simulator = get_simulator(config=simulator_config)
+
+    arrays = []
+    for name, shape, dtype in (theta_spec, flux_spec):
+        shm = SharedMemory(name=name)
+        _shared_memory.append(shm)
+        arrays.append(get_shared_array(shm, shape, dtype))
+    _theta, _flux = arrays
+
+
+def simulate_theta_i(i: int) -> tuple[int, bool]:
+    """
+    Simulate the spectrum for `theta[i]` and write the result directly
+    into the shared `flux` array. Returns the index `i` (because the
+    results of the pool can arrive in any order) and whether or not the
+    simulation was successful (i.e., False if the simulator timed out).
+    """
+
+    result = _simulator(_theta[i])
+    if result is None:
+        return i, False
+    _flux[i] = result[1]
+
+    return i, True
+
+
 if __name__ == "__main__":
 
     # -------------------------------------------------------------------------
@@ -291,11 +352,12 @@ if __name__ == "__main__":
 
             # Convert some arrays to float32 to save space
             for key in ("samples", "log_prob_samples"):
-                results[key] = results[key].astype(np.float32)
+                results[key] = results[key].astype(np.float32, copy=False)
 
             print("\nSaving results to HDF...", end=" ", flush=True)
             save_to_hdf(
                 file_path=output_file_path,
+                compression="lzf",
                 samples=results["samples"],
                 log_prob_samples=results["log_prob_samples"],
                 log_prob_theta_true=results["log_prob_theta_true"],
@@ -388,116 +450,140 @@ if __name__ == "__main__":
             )
             n_bins = len(target["flux"])
 
-            # Set up prior, simulator, and likelihood distribution
+            # Set up prior and likelihood distribution
+            # The simulator is created in the worker processes (see below)
             prior = get_prior(config=config.prior)
-            simulator = get_simulator(config=config.simulator)
             likelihood_distribution = get_likelihood_distribution(
                 flux_obs=target["flux"],
                 error_bars=target["error_bars"],
             )
 
-            # Set up a counter for the number of simulator timeouts.
-            # The upper limit is defined in the command line arguments.
+            # Evaluate the prior for all samples at once (vectorized). If the
+            # prior is 0, we don't need to run the simulator since the weight
+            # will be 0 anyway, so we only simulate the samples in the prior.
+            with np.errstate(divide="ignore"):
+                log_prior_values = np.log(prior.evaluate_batch(samples))
+            in_prior = np.isfinite(log_prior_values)
+            idx_in_prior = np.flatnonzero(in_prior)
+            print(f"Samples with non-zero prior: {in_prior.sum():,}\n")
+
+            # Compute spectra in parallel (only for samples with prior > 0)
+            # We use a persistent pool where every worker constructs its own
+            # simulator once, and the tasks are sent to the workers in chunks
+            # to reduce the communication overhead. The `samples` and the
+            # (preallocated) float32 `flux` array are placed in shared memory:
+            # The workers read `theta_i` and write the simulated spectrum
+            # directly into the shared array, so only the indices have to be
+            # pickled. Samples outside the prior (or timeouts) keep NaNs.
+            # If the simulator times out, the task is marked as unsuccessful.
+            # This usually only happens when running on a node that is
+            # experiencing issues. If the number of timeouts exceeds a certain
+            # threshold, we exit with code 13, which will trigger a
+            # resubmission of the job on a different node.
+            print("Simulating spectra (in parallel):", flush=True)
+            num_cpus = get_number_of_available_cores()
+            chunksize = max(1, len(idx_in_prior) // (num_cpus * 8))
+            flux_shape = (len(samples), n_bins)
+            theta_shm = copy_to_shared_memory(samples)
+            flux_shm = copy_to_shared_memory(
+                np.broadcast_to(np.float32(np.nan), flux_shape)
+            )
+            flux = get_shared_array(flux_shm, flux_shape, "float32")
             n_timeouts = 0
-
-            # Define a function that processes a single `theta_i`
-            def process_theta_i(
-                theta_i: np.ndarray,
-            ) -> tuple[np.ndarray, float, float]:
-                """
-                Returns the flux, the log-likelihood, and the log-prior
-                values for the given `theta_i`.
-                """
-
-                # Evaluate the prior at theta_i
-                # If the prior is 0, we don't really need to run the simulator
-                # since the importance sampling weight will be 0 anyway.
-                if (prior_value := prior.evaluate(theta_i)) <= 0:
-                    return np.full(n_bins, np.nan), -np.inf, -np.inf
-                log_prior_value = np.log(prior_value)
-
-                # Simulate the spectrum that belongs to theta_i
-                # If we get `None` here, it means the simulator has timed out,
-                # which usually only happens when running on a node that is
-                # experiencing some issues. If the number of timeouts across
-                # all parallel processes exceeds a certain threshold, we raise
-                # an error, which will trigger a resubmission of the job on a
-                # different node. We cannot directly call `sys.exit()` inside
-                # this function because this will cause the script to hang.
-                # Instead, we need to raise an exception and handle the exit
-                # code in __main__.
-                result = simulator(theta_i)
-                if result is None:
-
-                    # Increment the counter and check if limit is reached
-                    global n_timeouts  # access the counter defined outside
-                    n_timeouts += 1
-                    if n_timeouts > args.max_timeouts:
-                        raise RuntimeError("Too many timeouts!")
-
-                    # Print a debug message to stderr and return NaNs
+            try:
+                with Pool(
+                    processes=num_cpus,
+                    initializer=init_worker,
+                    initargs=(
+                        config.simulator,
+                        (theta_shm.name, samples.shape, samples.dtype.str),
+                        (flux_shm.name, flux_shape, flux.dtype.str),
+                    ),
+                ) as pool:
+                    results = pool.imap_unordered(
+                        simulate_theta_i,
+                        idx_in_prior.tolist(),
+                        chunksize=chunksize,
+                    )
+                    n_tasks = len(idx_in_prior)
+                    for _, success in tqdm(results, total=n_tasks, ncols=80):
+                        if success:
+                            continue
+                        n_timeouts += 1
+                        print(
+                            f"Simulator timed out! ({n_timeouts=})",
+                            file=sys.stderr,
+                            flush=True,
+                        )
+                        if n_timeouts > args.max_timeouts:
+                            pool.terminate()
+                            sys.exit(13)
+                print()
+
+                # Compute the log-likelihoods for all samples at once
+                # We use the log-likelihood to avoid numerical issues, because
+                # the likelihood can take on values on the order of 10^-1000.
+                # In cases where the `flux` contains NaNs (i.e., for samples
+                # outside the prior, for timeouts, or if the simulation
+                # failed), the log-likelihood is NaN, which is mapped to a
+                # weight of 0. We process the fluxes in blocks to limit the
+                # size of temporary (float64) arrays for the residuals.
+                log_likelihoods = np.full(len(samples), -np.inf)
+                for start in range(0, len(samples), 10_000):
+                    block = slice(start, start + 10_000)
+                    mask = in_prior[block]
+                    log_likelihoods[block][mask] = (
+                        likelihood_distribution.logpdf(flux[block][mask])
+                    )
+                is_nan = np.isnan(log_likelihoods)
+                if is_nan.any():
                     print(
-                        f"Simulator timed out! ({n_timeouts=})",
+                        f"NaN in loglikelihood for {is_nan.sum():,} samples!",
                         file=sys.stderr,
                         flush=True,
                     )
-                    return np.full(n_bins, np.nan), -np.inf, -np.inf
-
-                else:
-                    _, flux = result
-
-                # Compute the log-likelihood
-                # We use the log-likelihood to avoid numerical issues, because
-                # the likelihood can take on values on the order of 10^-1000.
-                # In cases where the `flux` contains NaNs, the log-likelihood
-                # will also be NaN, which will result in a weight of 0.
-                log_likelihood = likelihood_distribution.logpdf(flux)
-                if np.isnan(log_likelihood):
-                    print("NaN in loglikelihood!", file=sys.stderr, flush=True)
-                    return np.full(n_bins, np.nan), -np.inf, -np.inf
-
-                return flux, log_likelihood, log_prior_value
-
-            # Compute spectra, likelihoods and prior values in parallel
-            # If we encounter too many timeouts, we exit with code 13, which
-            # will trigger a resubmission of the job on a different node.
-            print("Simulating spectra (in parallel):", flush=True)
-            num_cpus = get_number_of_available_cores()
-            try:
-                results = p_map(
-                    process_theta_i,
-                    samples,
-                    num_cpus=num_cpus,
-                    ncols=80,
+                invalid = ~in_prior | is_nan
+                flux[invalid] = np.nan
+                log_likelihoods[invalid] = -np.inf
+                log_prior_values[invalid] = -np.inf
+                log_likelihoods = log_likelihoods.astype(np.float32)
+                log_prior_values = log_prior_values.astype(np.float32)
+
+                # Save the results for the current job. The `flux` is written
+                # directly from the shared memory (chunked and compressed, see
+                # `save_to_hdf()`), so we never hold a second copy of it ---
+                # unless it is stored as float16, which requires a (half-size)
+                # copy for the conversion. `get_storage_dtype()` checks that
+                # all values are within the (normal) range of float16, and
+                # otherwise falls back to float32 (with a warning), so that we
+                # never lose the simulation results because of the dtype.
+                flux_dtype = get_storage_dtype(
+                    array=flux,
+                    dtype=config.simulate_spectra.flux_dtype,
                 )
-            except RuntimeError as e:
-                if "Too many timeouts!" in str(e):
-                    sys.exit(13)
-                else:
-                    raise e
-            print()
-
-            # Unpack the results from the parallel map and convert to arrays
-            _flux, _log_likelihoods, _log_prior_values = zip(
-                *results,
-                strict=True,
-            )
-            flux = np.array(_flux)
-            log_likelihoods = np.array(_log_likelihoods).flatten()
-            log_prior_values = np.array(_log_prior_values).flatten()
+                print("Saving results to HDF...", end=" ", flush=True)
+                save_to_hdf(
+                    file_path=output_file_path,
+                    compression="lzf",
+                    flux=flux.astype(flux_dtype, copy=False),
+                    log_likelihoods=log_likelihoods,
+                    log_prior_values=log_prior_values,
+                    log_prob_samples=log_prob_samples.astype(
+                        np.float32, copy=False
+                    ),
+                    log_prob_theta_true=proposal_samples[
+                        "log_prob_theta_true"
+                    ],
+                    samples=samples.astype(np.float32, copy=False),
+                )
+                print("Done!\n\n")
 
-            # Save the results for the current job
-            print("Saving results to HDF...", end=" ", flush=True)
-            save_to_hdf(
-                file_path=output_file_path,
-                flux=flux.astype(np.float32),
-                log_likelihoods=log_likelihoods.astype(np.float32),
-                log_prior_values=log_prior_values.astype(np.float32),
-                log_prob_samples=log_prob_samples.astype(np.float32),
-                log_prob_theta_true=proposal_samples["log_prob_theta_true"],
-                samples=samples.astype(np.float32),
-            )
-            print("Done!\n\n")
+            # Release the shared memory (the view needs to be deleted first)
+            finally:
+                del flux
+                for shm in (theta_shm, flux_shm):
+                    shm.close()
+                    shm.unlink()
 
     # -------------------------------------------------------------------------
     # Stage 4: Merge the simulations from all jobs and compute the weights
@@ -526,6 +612,7 @@ if __name__ == "__main__":
             singleton_keys=["log_prob_theta_true"],
             delete_after_merge=delete_after_merge,
             show_progressbar=True,
+            compression="lzf",
         )
         print()
 
@@ -565,7 +652,9 @@ if __name__ == "__main__":
             weights=weights,
             log_prior_values=merged["log_prior_values"],
         )
-        log_Z, log_Z_std = compute_log_evidence(merged["raw_log_weights"])
+        # Note: The log-evidence is computed from the float64 raw log-weights;
+        # the float32 copy in `merged` is only meant for saving to HDF
+        log_Z, log_Z_std = compute_log_evidence(raw_log_weights)
         print(f"  Effective sample size: {n_eff:.2f}")
         print(f"  Sampling efficiency:   {100 * sampling_efficiency:.2f}%\n")
         print(f"  Simulation efficiency: {100 * simulation_efficiency:.2f}%\n")
@@ -580,7 +669,11 @@ if __name__ == "__main__":
 
         # Save the full results
         print("Saving full results to HDF...", end=" ")
-        save_to_hdf(file_path=args.working_dir / "results.hdf", **merged)
+        save_to_hdf(
+            file_path=args.working_dir / "results.hdf",
+            compression="lzf",
+            **merged,
+        )
         print("Done!")
 
         # Drop some quantities that are usually not needed for downstream
@@ -590,7 +683,11 @@ if __name__ == "__main__":
         del merged["log_prior_values"]
         del merged["log_prob_samples"]
         del merged["log_likelihoods"]
-        save_to_hdf(file_path=args.working_dir / "results.min.hdf", **merged)
+        save_to_hdf(
+            file_path=args.working_dir / "results.min.hdf",
+            compression="lzf",
+            **merged,
+        )
         print("Done!")
 
     # -------------------------------------------------------------------------
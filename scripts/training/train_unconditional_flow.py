@@ -36,7 +36,6 @@ from fm4ar.utils.htcondor import (
     condor_submit_bid,
     create_submission_file,
 )
-from fm4ar.utils.multiproc import get_number_of_available_cores
 
 
 def get_cli_arguments() -> argparse.Namespace:
@@ -169,22 +168,26 @@ def prepare_data(
     print("Done!")
 
     # Create dataloaders
+    # The samples are already in memory, so we do not use any workers: For
+    # a `TensorDataset`, sending every batch from a worker process to the
+    # main process is more expensive than simply indexing the tensor, and
+    # the workers would also need to be re-spawned for every epoch.
     print("Creating dataloaders...", end=" ", flush=True)
     train_loader = DataLoader(
         dataset=TensorDataset(theta_train),
         batch_size=config.training.batch_size,
         shuffle=True,
         drop_last=True,
-        num_workers=get_number_of_available_cores(),
-        pin_memory=True,
+        num_workers=0,
+        pin_memory=torch.cuda.is_available(),
     )
     valid_loader = DataLoader(
         dataset=TensorDataset(theta_valid),
         batch_size=config.training.batch_size,
         shuffle=False,
         drop_last=False,
-        num_workers=get_number_of_available_cores(),
-        pin_memory=True,
+        num_workers=0,
+        pin_memory=torch.cuda.is_available(),
     )
     print("Done!\n")
 
@@ -9,8 +9,8 @@ from time import time
 
 import torch
 
-from fm4ar.torchutils.general import get_number_of_parameters
-from fm4ar.training.preparation import prepare_new
+from fm4ar.datasets import load_dataset
+from fm4ar.models.build_model import build_model
 from fm4ar.utils.config import load_config
 
 if __name__ == "__main__":
@@ -36,25 +36,52 @@ if __name__ == "__main__":
     config = load_config(args.experiment_dir)
     config["dataset"]["n_train_samples"] = 10
     config["dataset"]["n_valid_samples"] = 0
-    config["local"]["device"] = "cpu"
     config["local"]["n_workers"] = 0
     if "wandb" in config["local"]:
         del config["local"]["wandb"]
 
-    # Load data and build model (needed to infer theta_dim and context_dim)
-    model, dataset = prepare_new(
-        experiment_dir=args.experiment_dir,
-        config=config,
-    )
-    print("\n")
+    # Load the (small) dataset; we need it to infer dim_theta and dim_context,
+    # because the latter depends, e.g., on the data transforms
+    print("Loading dataset...", end=" ", flush=True)
+    dataset = load_dataset(config=config)
+    config["model"]["dim_theta"] = dataset.dim_theta
+    config["model"]["dim_context"] = dataset.dim_context
+    print("Done!", flush=True)
+
+    # Build the model on the "meta" device: This creates all parameters with
+    # the correct shapes (which is all we need to count them), but does not
+    # allocate any memory for them or run the weight initialization. Some
+    # modules (e.g., the coupling transforms of the `glasflow` flows used by
+    # NPE models) run operations without a meta implementation when they are
+    # constructed; in this case, we fall back to building the model on CPU.
+    print("Building model from configuration...", end=" ", flush=True)
+    try:
+        with torch.device("meta"):
+            model = build_model(
+                experiment_dir=args.experiment_dir,
+                config=config,
+                device="meta",
+            )
+    except NotImplementedError:
+        model = build_model(
+            experiment_dir=args.experiment_dir,
+            config=config,
+            device="cpu",
+        )
+    print(f"Done! (device: {model.device})\n\n", flush=True)
 
     network: torch.nn.Module
     for name, network in (
         ("total", model.network),
         ("context embedding net", model.network.context_embedding_net),
     ):
-        n_trainable = get_number_of_parameters(network, (True,))
-        n_fixed = get_number_of_parameters(network, (False,))
+        # Count trainable and fixed parameters in a single pass
+        n_trainable = n_fixed = 0
+        for p in network.parameters():
+            if p.requires_grad:
+                n_trainable += p.numel()
+            else:
+                n_fixed += p.numel()
         n_total = n_trainable + n_fixed
         print(f"Number of {name} parameters:", flush=True)
         print(f"n_trainable: {n_trainable:,}", flush=True)
@@ -69,6 +69,7 @@ def test__load_dataset_1(path_to_dataset_1: Path) -> None:
 
     # Basic check of the dataset
     assert len(dataset) == 2
+    assert dataset.theta.dtype == np.float32
     assert dataset.theta.shape == torch.Size([2, 5])
     assert dataset.flux.shape == torch.Size([2, 5])
     assert dataset.wlen.shape == torch.Size([1, 5])
@@ -110,3 +111,84 @@ def test__load_dataset_2(path_to_dataset_2: Path) -> None:
     assert dataset[0]["theta"].shape == torch.Size([5])
     assert dataset[0]["flux"].shape == torch.Size([5])
     assert dataset[0]["wlen"].shape == torch.Size([5])
+
+
+def test__load_dataset_lazy(path_to_dataset_2: Path) -> None:
+    """
+    Unit test for `fm4ar.datasets.load_dataset` with `lazy=True`.
+    """
+
+    config = {
+        "dataset": {
+            "file_path": path_to_dataset_2,
+            "n_train_samples": 2,
+            "n_valid_samples": 0,
+            "lazy": True,
+        }
+    }
+    lazy_dataset = load_dataset(config)
+    config["dataset"]["lazy"] = False
+    eager_dataset = load_dataset(config)
+
+    # The lazy dataset should return the same samples as the eager one
+    assert len(lazy_dataset) == len(eager_dataset) == 2
+    assert lazy_dataset.dim_theta == 5
+    for i in range(2):
+        for key in ("theta", "flux", "wlen"):
+            assert torch.equal(lazy_dataset[i][key], eager_dataset[i][key])
+
+
+def test__load_dataset_zarr(path_to_dataset_1: Path, tmp_path: Path) -> None:
+    """
+    Unit test for `fm4ar.datasets.load_dataset` with a zarr store.
+    """
+
+    pytest.importorskip("zarr")
+    from fm4ar.utils.zarr_store import convert_hdf_to_zarr
+
+    zarr_path = tmp_path / "dummy_dataset_1.zarr"
+    convert_hdf_to_zarr(path_to_dataset_1, zarr_path, target_nbytes=40)
+
+    config = {
+        "dataset": {
+            "file_path": zarr_path,
+            "n_train_samples": 2,
+            "n_valid_samples": 0,
+        }
+    }
+    dataset = load_dataset(config)
+    config["dataset"]["file_path"] = path_to_dataset_1
+    hdf_dataset = load_dataset(config)
+
+    # The zarr dataset should match the one loaded from the HDF file
+    assert len(dataset) == 2
+    assert dataset.wlen.shape == (1, 5)
+    for key in ("theta", "flux", "wlen"):
+        assert np.array_equal(getattr(dataset, key), getattr(hdf_dataset, key))
+
+    # Lazy loading is only supported for HDF5 files
+    config["dataset"] = {**config["dataset"], "file_path": zarr_path}
+    config["dataset"]["lazy"] = True
+    with pytest.raises(ValueError, match="only supported for HDF5"):
+        load_dataset(config)
+
+
+def test__load_dataset_dtype(path_to_dataset_1: Path) -> None:
+    """
+    Unit test for the `dtype` option of `fm4ar.datasets.load_dataset`.
+    """
+
+    config = {
+        "dataset": {
+            "file_path": path_to_dataset_1,
+            "n_train_samples": 3,
+            "n_valid_samples": 0,
+            "dtype": "float64",
+        }
+    }
+    dataset = load_dataset(config)
+    for key in ("theta", "flux", "wlen"):
+        assert getattr(dataset, key).dtype == np.float64
+
+    # The samples are always returned as float32 tensors
+    assert dataset[0]["flux"].dtype == torch.float32
@@ -92,3 +92,33 @@ def test__theta_scalers() -> None:
         scaler.inverse_tensor(scaler.forward_tensor(tensor)),
         tensor,
     )
+
+
+@pytest.mark.parametrize("method", ["identity", "mean_std", "min_max"])
+def test__theta_scalers_tensor_methods(method: str) -> None:
+    """
+    Test that the (torch-native) `forward_tensor()` and `inverse_tensor()`
+    methods agree with the NumPy implementations.
+    """
+
+    kwargs = {} if method == "identity" else {"dataset": "vasist_2023"}
+    scaler = get_theta_scaler({"method": method, "kwargs": kwargs})
+
+    rng = np.random.default_rng(42)
+    theta = np.array(THETA_0) + rng.normal(0, 0.01, size=(5, 16))
+    tensor = torch.from_numpy(theta).float()
+
+    # The output should have the same dtype (and device) as the input
+    transformed = scaler.forward_tensor(tensor)
+    assert transformed.dtype == torch.float32
+    assert transformed.device == tensor.device
+    assert np.allclose(
+        transformed.numpy(),
+        scaler.forward_array(theta),
+        atol=1e-5,
+    )
+    assert np.allclose(
+        scaler.inverse_tensor(transformed).numpy(),
+        theta,
+        atol=1e-4,
+    )
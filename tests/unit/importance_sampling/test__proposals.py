@@ -12,7 +12,10 @@ import pytest
 import torch
 
 from fm4ar.importance_sampling.config import load_config as load_is_config
-from fm4ar.importance_sampling.proposals import draw_proposal_samples
+from fm4ar.importance_sampling.proposals import (
+    draw_proposal_samples,
+    estimate_chunk_size,
+)
 from fm4ar.models.build_model import build_model
 from fm4ar.nn.flows import create_unconditional_flow_wrapper
 from fm4ar.unconditional_flow.config import load_config as load_flow_config
@@ -196,3 +199,43 @@ def test__draw_proposal_samples__unconditional_flow(
     assert results["samples"].shape == (n_samples, dim_theta)
     assert results["log_prob_samples"].shape == (n_samples,)
     assert results["log_prob_theta_true"].shape == (1,)
+
+
+def test__estimate_chunk_size(monkeypatch: pytest.MonkeyPatch) -> None:
+    """
+    Test `estimate_chunk_size()`.
+    """
+
+    def sample_fn(n: int) -> torch.Tensor:
+        return torch.zeros(n, 1)
+
+    # Case 1: Without a GPU, we simply get the default
+    monkeypatch.setattr(torch.cuda, "is_available", lambda: False)
+    assert estimate_chunk_size(sample_fn=sample_fn, default=123) == 123
+
+    # For the remaining cases, we fake a GPU where the trial chunk with 64
+    # samples has a peak memory usage of 64 kB (i.e., 1000 bytes per sample)
+    free_nbytes = 10_000_000
+    monkeypatch.setattr(torch.cuda, "is_available", lambda: True)
+    monkeypatch.setattr(torch.cuda, "synchronize", lambda: None)
+    monkeypatch.setattr(torch.cuda, "reset_peak_memory_stats", lambda: None)
+    monkeypatch.setattr(torch.cuda, "memory_allocated", lambda: 500)
+    monkeypatch.setattr(
+        torch.cuda, "max_memory_allocated", lambda: 500 + 64 * 1000
+    )
+    monkeypatch.setattr(
+        torch.cuda, "mem_get_info", lambda: (free_nbytes, 10 * free_nbytes)
+    )
+
+    # Case 2: The chunk size is scaled to the free memory (times safety factor)
+    chunk_size = estimate_chunk_size(
+        sample_fn=sample_fn,
+        n_trial=64,
+        safety_factor=0.7,
+    )
+    assert chunk_size == 7_000
+
+    # Case 3: The chunk size is bounded from below by `n_trial`
+    free_nbytes = 1_000
+    chunk_size = estimate_chunk_size(sample_fn=sample_fn, n_trial=64)
+    assert chunk_size == 64
@@ -3,12 +3,14 @@ Tests for `fm4py.importance_sampling.utils`.
 """
 
 import numpy as np
+from scipy.special import logsumexp
 
 from fm4ar.importance_sampling.utils import (
     clip_and_normalize_weights,
     compute_effective_sample_size,
     compute_is_weights,
     compute_log_evidence,
+    compute_raw_log_weights,
 )
 
 
@@ -76,6 +78,14 @@ def test__compute_effective_sample_size() -> None:
     assert np.isclose(sampling_efficiency, 0.9)
     assert np.isclose(simulation_efficiency, 0.9)
 
+    # Case 5: float32 weights should be accumulated in float64
+    weights = np.random.default_rng(42).random(1_000_000).astype(np.float32)
+    n_eff, _, _ = compute_effective_sample_size(weights=weights)
+    expected = np.sum(weights.astype(np.float64)) ** 2 / np.sum(
+        weights.astype(np.float64) ** 2
+    )
+    assert np.isclose(n_eff, expected, rtol=1e-12)
+
 
 def test__compute_is_weights() -> None:
     """
@@ -98,6 +108,51 @@ def test__compute_is_weights() -> None:
     assert np.allclose(np.sum(normalized_weights), 3)
     assert np.allclose(normalized_weights, [1.0, 1.0, 1.0])
 
+    # Case 2: float32 inputs with large log-likelihoods (the raw log-weights
+    # should be computed in float64 to not lose the small differences)
+    log_likelihoods = np.array([-12345.0, -12345.5], dtype=np.float32)
+    log_prior_values = np.zeros(2, dtype=np.float32)
+    log_probs = np.array([0.0, -0.5001], dtype=np.float32)
+    raw_log_weights, normalized_weights = compute_is_weights(
+        log_likelihoods=log_likelihoods,
+        log_prior_values=log_prior_values,
+        log_probs=log_probs,
+    )
+    assert raw_log_weights.dtype == np.float64
+    assert np.isclose(raw_log_weights[1] - raw_log_weights[0], 0.0001, 1e-3)
+
+    # Case 3: Explicitly compute the weights in float32
+    raw_log_weights, normalized_weights = compute_is_weights(
+        log_likelihoods=np.array([-1, -2, -4], dtype=np.float32),
+        log_prior_values=np.array([-2, -4, -8], dtype=np.float32),
+        log_probs=np.array([-3, -6, -12], dtype=np.float32),
+        dtype=np.float32,
+    )
+    assert raw_log_weights.dtype == np.float32
+    assert normalized_weights.dtype == np.float32
+    assert np.allclose(normalized_weights, [1.0, 1.0, 1.0])
+
+    # Case 4: Both outputs should be independent arrays, and they should
+    # match the results of the stand-alone functions
+    raw_log_weights, normalized_weights = compute_is_weights(
+        log_likelihoods=log_likelihoods,
+        log_prior_values=log_prior_values,
+        log_probs=log_probs,
+    )
+    assert not np.shares_memory(raw_log_weights, normalized_weights)
+    assert np.array_equal(
+        raw_log_weights,
+        compute_raw_log_weights(
+            log_likelihoods=log_likelihoods,
+            log_prior_values=log_prior_values,
+            log_probs=log_probs,
+        ),
+    )
+    assert np.array_equal(
+        normalized_weights,
+        clip_and_normalize_weights(raw_log_weights),
+    )
+
 
 def test__clip_and_normalize_weights() -> None:
     """
@@ -121,6 +176,15 @@ def test__clip_and_normalize_weights() -> None:
     )
     assert np.allclose(np.max(normalized_weights), 1.0028639021473102)
 
+    # Case 3: Passing a precomputed LSE should give the same result
+    assert np.allclose(
+        clip_and_normalize_weights(
+            raw_log_weights=raw_log_weights,
+            lse=logsumexp(raw_log_weights),
+        ),
+        clip_and_normalize_weights(raw_log_weights=raw_log_weights),
+    )
+
 
 def test__compute_log_evidence() -> None:
     """
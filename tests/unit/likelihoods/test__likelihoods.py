@@ -3,6 +3,7 @@ Unit tests for `fm4ar.likelihoods`.
 """
 
 import numpy as np
+from scipy.stats import multivariate_normal
 
 from fm4ar.likelihoods import get_likelihood_distribution
 
@@ -31,3 +32,20 @@ def test__get_likelihood_distribution() -> None:
         likelihood.logpdf(x=np.array([0.0, 0.0])),
         np.log(1 / (8 * np.pi)),
     )
+
+    # Case 3: Compare with scipy (for a single spectrum and for a batch)
+    rng = np.random.default_rng(42)
+    flux_obs = rng.normal(0, 1, 10)
+    error_bars = rng.uniform(0.5, 2.0, 10)
+    x = rng.normal(0, 1, (5, 10))
+    scipy_likelihood = multivariate_normal(
+        mean=flux_obs,
+        cov=np.diag(error_bars**2),
+    )
+    likelihood = get_likelihood_distribution(
+        flux_obs=flux_obs,
+        error_bars=error_bars,
+    )
+    assert np.isclose(likelihood.logpdf(x[0]), scipy_likelihood.logpdf(x[0]))
+    assert np.allclose(likelihood.logpdf(x), scipy_likelihood.logpdf(x))
+    assert np.allclose(likelihood.pdf(x), scipy_likelihood.pdf(x))
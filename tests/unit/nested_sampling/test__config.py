@@ -2,7 +2,10 @@
 Unit tests for `fm4ar.nested_sampling.config`.
 """
 
-from fm4ar.nested_sampling.config import load_config
+import pytest
+from pydantic import ValidationError
+
+from fm4ar.nested_sampling.config import SamplerConfig, load_config
 from fm4ar.utils.paths import get_experiments_dir
 
 
@@ -17,3 +20,16 @@ def test__load_config() -> None:
 
     # Check that the config is loaded correctly
     assert config.sampler.library == "nautilus"
+
+
+def test__sampler_config() -> None:
+    """
+    Test that `SamplerConfig` rejects unknown keys.
+    """
+
+    with pytest.raises(ValidationError):
+        SamplerConfig(
+            library="nautilus",
+            n_livepoints=100,
+            n_live_points=100,  # type: ignore
+        )
@@ -14,11 +14,12 @@ import pytest
 from yaml import safe_dump
 
 from fm4ar.nested_sampling.config import load_config
-from fm4ar.nested_sampling.samplers import get_sampler
+from fm4ar.nested_sampling.samplers import Sampler, get_sampler
 from fm4ar.utils.paths import get_experiments_dir
 
 
 @pytest.mark.slow
+@pytest.mark.timing
 @pytest.mark.parametrize(
     "library, sampler_kwargs, run_kwargs",
     [
@@ -35,6 +36,18 @@ from fm4ar.utils.paths import get_experiments_dir
             },
             {"n_calls_between_timeout_checks": 100},
         ),
+        (
+            "ultranest",
+            {
+                "stepsampler": {
+                    "method": "PopulationSliceSampler",
+                    "generate_direction": "generate_cube_oriented_direction",
+                    "popsize": 4,
+                    "nsteps": 10,
+                }
+            },
+            {"n_calls_between_timeout_checks": 20},
+        ),
         (
             "ultranest",
             {},
@@ -119,3 +132,19 @@ def test__sampler_timeout(
     # The runtime limitation is not exact (especially for problems where
     # we are not dominated by the simulator), so we allow for some slack
     assert runtime < 1.5 * max_runtime
+
+
+def test__prepare_sampler_kwargs() -> None:
+    """
+    Test `Sampler._prepare_sampler_kwargs()`.
+    """
+
+    # Case 1: None
+    assert Sampler._prepare_sampler_kwargs(None) == {}
+
+    # Case 2: Popping keys (also from nested dicts) must not modify the input
+    sampler_kwargs = {"use_pool": True, "stepsampler": {"nsteps": 10}}
+    prepared = Sampler._prepare_sampler_kwargs(sampler_kwargs)
+    prepared.pop("use_pool")
+    prepared["stepsampler"].pop("nsteps")
+    assert sampler_kwargs == {"use_pool": True, "stepsampler": {"nsteps": 10}}
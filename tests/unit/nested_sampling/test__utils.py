@@ -2,11 +2,16 @@
 Unit tests for `fm4ar.nested_sampling.utils`.
 """
 
+from pathlib import Path
+
 import numpy as np
 import pytest
 
 from fm4ar.datasets.vasist_2023.prior import Prior as Vasist2023Prior
-from fm4ar.nested_sampling.utils import get_parameter_masks
+from fm4ar.nested_sampling.utils import (
+    create_posterior_plot,
+    get_parameter_masks,
+)
 from fm4ar.priors.config import PriorConfig
 
 
@@ -66,3 +71,49 @@ def test__get_parameter_masks() -> None:
     with pytest.raises(ValueError) as value_error:
         get_parameter_masks(prior=prior, config=config)
     assert "Unknown action 'unknown' for parameter" in str(value_error.value)
+
+    # Case 4: valid configuration without any conditioned parameters
+    prior = Vasist2023Prior(random_seed=42)
+    config = PriorConfig(
+        dataset="vasist_2023",
+        parameters={name: "infer" for name in prior.names},
+        random_seed=42,
+    )
+    (
+        infer_mask,
+        marginalize_mask,
+        condition_mask,
+        condition_values,
+    ) = get_parameter_masks(prior=prior, config=config)
+    assert infer_mask.all()
+    assert not marginalize_mask.any()
+    assert not condition_mask.any()
+    assert np.isnan(condition_values).all()
+
+
+@pytest.mark.parametrize("max_plot_samples", [None, 100])
+def test__create_posterior_plot(
+    tmp_path: Path,
+    max_plot_samples: int | None,
+) -> None:
+    """
+    Test `create_posterior_plot()`.
+    """
+
+    rng = np.random.default_rng(42)
+    samples = rng.normal(0, 1, size=(1_000, 2))
+    weights = rng.uniform(0, 1, size=1_000)
+    weights[:10] = 0
+
+    file_path = tmp_path / "posterior.png"
+    fig = create_posterior_plot(
+        samples=samples,
+        weights=weights,
+        names=["a", "b"],
+        extents=(np.full(2, -5.0), np.full(2, 5.0)),
+        ground_truth=np.zeros(2),
+        file_path=file_path,
+        max_plot_samples=max_plot_samples,
+    )
+    assert fig is not None
+    assert file_path.exists()
@@ -75,3 +75,11 @@ def test__get_prior() -> None:
         0.004709095618186529,
         atol=1e-10,
     )
+
+    # Batched evaluation should match the evaluation of single samples
+    theta = prior.transform(u=rng.uniform(-0.1, 1.1, size=(100, 16)))
+    theta[np.isnan(theta)] = -1e6  # ppf() is NaN outside of [0, 1]
+    values = prior.evaluate_batch(theta)
+    assert values.shape == (100,)
+    assert np.allclose(values, [prior.evaluate(t) for t in theta])
+    assert np.any(values == 0) and np.any(values > 0)
@@ -11,15 +11,18 @@ from fm4ar.target_spectrum import load_target_spectrum
 from fm4ar.utils.hdf import save_to_hdf
 
 
-@pytest.fixture
-def path_to_target_spectrum(tmp_path: Path) -> Path:
+@pytest.fixture(scope="module")
+def path_to_target_spectrum(tmp_path_factory: pytest.TempPathFactory) -> Path:
     """
-    Fixture for the path to the target spectrum.
+    Fixture for the path to the target spectrum. The file is only read,
+    so we create it only once for all tests in this module (using the
+    "core" driver, which writes the file to disk in a single step).
     """
 
-    file_path = tmp_path / "target_spectrum.hdf"
+    file_path = tmp_path_factory.mktemp("target") / "target_spectrum.hdf"
     save_to_hdf(
         file_path=file_path,
+        driver="core",
         wlen=np.array([1, 2, 3]),
         flux=np.array([[4, 5, 6], [7, 8, 9]]),
         error_bars=np.array([[1, 1, 1], [2, 2, 2]]),
@@ -44,3 +47,13 @@ def test__load_target_spectrum(path_to_target_spectrum: Path) -> None:
     assert np.allclose(target["flux"], [7, 8, 9])
     assert np.allclose(target["error_bars"], [2, 2, 2])
     assert np.allclose(target["theta"], [1, 1, 1])
+
+    # Load both spectra at once (in reverse order, to test the reordering)
+    target = load_target_spectrum(
+        file_path=path_to_target_spectrum,
+        index=[1, 0],
+    )
+    assert np.allclose(target["wlen"], [1, 2, 3])
+    assert np.allclose(target["flux"], [[7, 8, 9], [4, 5, 6]])
+    assert np.allclose(target["error_bars"], [[2, 2, 2], [1, 1, 1]])
+    assert np.allclose(target["theta"], [[1, 1, 1], [0, 0, 0]])
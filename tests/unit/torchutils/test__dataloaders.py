@@ -60,6 +60,10 @@ def test__build_dataloaders(
     assert len(train_loader.dataset) == 64  # type: ignore
     assert len(valid_loader.dataset) == 16  # type: ignore
 
+    # Check that the workers are persistent and prefetch batches
+    assert train_loader.persistent_workers == (n_workers > 0)
+    assert train_loader.prefetch_factor == (4 if n_workers > 0 else None)
+
     # Check that the dataset split is reproducible
     assert sum(train_loader.dataset.indices) == 2431  # type: ignore
     assert sum(valid_loader.dataset.indices) == 729  # type: ignore
@@ -12,6 +12,7 @@ from fm4ar.nn.modules import Sine
 from fm4ar.torchutils.general import (
     check_for_nans,
     get_activation_from_name,
+    get_amp_dtype,
     get_cuda_info,
     get_number_of_parameters,
     resolve_device,
@@ -79,6 +80,25 @@ def test__get_activation_from_string(
         assert isinstance(activation, expected_activation)
 
 
+def test__get_amp_dtype(monkeypatch: pytest.MonkeyPatch) -> None:
+    """
+    Test `fm4ar.torchutils.general.get_amp_dtype()`.
+    """
+
+    # Case 1: CPU
+    assert get_amp_dtype(torch.device("cpu")) == torch.float16
+
+    # Case 2: GPU without bfloat16 support
+    with monkeypatch.context() as mp:
+        mp.setattr("torch.cuda.is_bf16_supported", lambda: False)
+        assert get_amp_dtype(torch.device("cuda")) == torch.float16
+
+    # Case 3: GPU with bfloat16 support
+    with monkeypatch.context() as mp:
+        mp.setattr("torch.cuda.is_bf16_supported", lambda: True)
+        assert get_amp_dtype(torch.device("cuda")) == torch.bfloat16
+
+
 def test__get_cuda_info(monkeypatch: pytest.MonkeyPatch) -> None:
     """
     Test `fm4ar.torchutils.general.get_cuda_info()`.
@@ -3,8 +3,12 @@ Tests for `fm4ar.training.wandb`.
 """
 
 from pathlib import Path
+from typing import Any
 
-from fm4ar.training.wandb import get_wandb_id
+import pytest
+import wandb
+
+from fm4ar.training.wandb import get_wandb_id, init_wandb
 
 
 def test__get_wandb_id(tmp_path: Path) -> None:
@@ -19,3 +23,42 @@ def test__get_wandb_id(tmp_path: Path) -> None:
 
     # Case 2: wandb_id file exists
     assert get_wandb_id(experiment_dir=tmp_path) == wandb_id
+
+
+def test__init_wandb(monkeypatch: pytest.MonkeyPatch) -> None:
+    """
+    Test `fm4ar.training.wandb.init_wandb()`.
+    """
+
+    calls: list[dict[str, Any]] = []
+    delays: list[float] = []
+
+    def failing_init(**kwargs: Any) -> None:
+        calls.append(kwargs)
+        if len(calls) < 3:
+            raise wandb.errors.CommError("mock network error")
+
+    with monkeypatch.context() as context:
+        context.setattr(wandb, "init", failing_init)
+        context.setattr("time.sleep", delays.append)
+
+        # Case 1: Succeeds on the third attempt (with increasing delays)
+        init_wandb(max_attempts=5, id="abc")
+        assert len(calls) == 3
+        assert all(call["id"] == "abc" for call in calls)
+        assert all("settings" in call for call in calls)
+        assert len(delays) == 2
+        assert 2 <= delays[0] < 3
+        assert 4 <= delays[1] < 5
+
+        # Case 2: Too few attempts
+        calls.clear()
+        with pytest.raises(wandb.errors.CommError):
+            init_wandb(max_attempts=2)
+        assert len(calls) == 2
+
+        # Case 3: Time budget exceeded
+        calls.clear()
+        with pytest.raises(wandb.errors.CommError):
+            init_wandb(max_attempts=5, max_total_time=1.0)
+        assert len(calls) == 1
@@ -2,12 +2,24 @@
 Tests for `fm4ar.utils.hdf`.
 """
 
+import pickle
 from pathlib import Path
 
+import h5py
 import numpy as np
 import pytest
 
-from fm4ar.utils.hdf import load_from_hdf, merge_hdf_files, save_to_hdf
+from fm4ar.utils.hdf import (
+    LazyHDFArray,
+    get_aligned_block_rows,
+    get_row_chunks,
+    get_storage_dtype,
+    load_from_hdf,
+    merge_hdf_files,
+    read_rows_from_hdf,
+    rechunk_hdf_file,
+    save_to_hdf,
+)
 
 
 def test__save_to_hdf__load_from_hdf(
@@ -50,6 +62,34 @@ def test__save_to_hdf__load_from_hdf(
     assert "Warning: Key 'invalid' not found in HDF file!" in out
     assert np.array_equal(loaded["invalid"], np.empty(shape=()))
 
+    # Case 6: Save with compression (chunked along the rows)
+    a4 = np.random.default_rng(42).normal(size=(100, 7)).astype(np.float32)
+    save_to_hdf(
+        file_path=file_path,
+        compression="lzf",
+        a1=a1,
+        a4=a4,
+        scalar=np.array(1.0),
+        empty=np.array([]),
+    )
+    with h5py.File(file_path, "r") as f:
+        assert f["a4"].compression == "lzf"
+        assert f["a4"].chunks == (100, 7)
+        assert f["scalar"].chunks is None
+        assert f["empty"].chunks is None
+    loaded = load_from_hdf(file_path=file_path, keys=None)
+    assert set(loaded.keys()) == {"a1", "a4", "scalar", "empty"}
+    assert np.array_equal(loaded["a4"], a4)
+    assert np.array_equal(loaded["a1"], a1)
+    assert loaded["scalar"] == 1.0
+
+    # Case 7: Save using the "core" driver (the file is still written)
+    save_to_hdf(file_path=file_path, driver="core", a1=a1, a2=a2)
+    loaded = load_from_hdf(file_path=file_path, keys=None)
+    assert set(loaded.keys()) == {"a1", "a2"}
+    assert np.array_equal(loaded["a1"], a1)
+    assert np.array_equal(loaded["a2"], a2)
+
 
 def test__merge_hdf_file(
     tmp_path: Path,
@@ -83,6 +123,10 @@ def test__merge_hdf_file(
     assert np.array_equal(loaded["a1"], np.array([1, 2, 5, 6]))
     assert np.array_equal(loaded["a2"], np.array([3.0, 4.0]))
 
+    # Check that the merged datasets are chunked along the rows
+    with h5py.File(output_file, "r") as f:
+        assert f["a1"].chunks == get_row_chunks((0,), f["a1"].dtype)
+
     # Check if the original files were deleted
     assert not file1.exists()
     assert not file2.exists()
@@ -97,3 +141,218 @@ def test__merge_hdf_file(
     out, err = capsys.readouterr()
     assert "No files to merge.\n" in out
     assert not output_file.exists()
+
+    # Test case where the dtypes differ between the files: The merged dataset
+    # should use the "largest" dtype, so that no values are lost
+    save_to_hdf(file_path=file1, a1=np.array([1, 2], dtype=np.float16))
+    save_to_hdf(file_path=file2, a1=np.array([1e5, 2], dtype=np.float32))
+    output_file = tmp_path / "merged-mixed.hdf"
+    merge_hdf_files(
+        target_dir=tmp_path,
+        name_pattern="file[12].hdf",
+        output_file_path=output_file,
+        singleton_keys=[],
+    )
+    with h5py.File(output_file, "r") as f:
+        assert f["a1"].dtype == np.float32
+        assert np.array_equal(f["a1"][...], [1, 2, 1e5, 2])
+
+
+def test__get_storage_dtype(capsys: pytest.CaptureFixture) -> None:
+    """
+    Test `get_storage_dtype()`.
+    """
+
+    # Case 1: Values are within the range of float16 (NaN and 0 are ignored)
+    array = np.array([[np.nan, 0.0, 1.0], [-2.5, 1e-3, 1e4]], np.float32)
+    assert get_storage_dtype(array, "float16", block_rows=1) == np.float16
+
+    # Case 2: Same dtype as the array
+    assert get_storage_dtype(array, "float32") == np.float32
+
+    # Case 3: Values that are too large (or inf) for float16
+    for value in (1e5, -1e5, np.inf):
+        array = np.array([[1.0, 1.0], [value, 1.0]], np.float32)
+        assert get_storage_dtype(array, "float16", block_rows=1) == np.float32
+        out, _ = capsys.readouterr()
+        assert "cannot be stored as float16" in out
+        assert "Falling back to float32" in out
+
+    # Case 4: Non-zero values that are too small (i.e., subnormal) for float16
+    array = np.array([[1.0, 1e-6], [0.0, 1.0]], np.float32)
+    assert get_storage_dtype(array, "float16") == np.float32
+    out, _ = capsys.readouterr()
+    assert "Falling back to float32" in out
+
+
+def test__read_rows_from_hdf(tmp_path: Path) -> None:
+    """
+    Test `read_rows_from_hdf()`.
+    """
+
+    file_path = tmp_path / "test.hdf"
+    a1 = np.arange(12, dtype=np.float32).reshape(4, 3)
+    a2 = np.array(42)
+    save_to_hdf(file_path=file_path, a1=a1, a2=a2)
+
+    with h5py.File(file_path, "r") as f:
+
+        # Case 1: Read all rows
+        rows = read_rows_from_hdf(f["a1"])
+        assert rows.dtype == np.float32
+        assert np.array_equal(rows, a1)
+
+        # Case 2: Read only the first two rows
+        rows = read_rows_from_hdf(f["a1"], n_rows=2)
+        assert np.array_equal(rows, a1[:2])
+
+        # Case 3: Read more rows than there are in the dataset
+        rows = read_rows_from_hdf(f["a1"], n_rows=10)
+        assert np.array_equal(rows, a1)
+
+        # Case 4: Read zero rows
+        rows = read_rows_from_hdf(f["a1"], n_rows=0)
+        assert rows.shape == (0, 3)
+
+        # Case 5: Read a scalar dataset
+        rows = read_rows_from_hdf(f["a2"])
+        assert rows.shape == ()
+        assert rows == 42
+
+        # Case 6: Convert to a different dtype while reading
+        rows = read_rows_from_hdf(f["a1"], n_rows=3, dtype=np.float64)
+        assert rows.dtype == np.float64
+        assert np.array_equal(rows, a1[:3])
+
+    # Case 7: Chunked dataset, read in several chunk-aligned blocks
+    a3 = np.arange(300, dtype=np.float64).reshape(100, 3)
+    with h5py.File(file_path, "a") as f:
+        f.create_dataset(name="a3", data=a3, chunks=(7, 3))
+    with h5py.File(file_path, "r") as f:
+        rows = read_rows_from_hdf(f["a3"], n_rows=95, block_nbytes=400)
+        assert np.array_equal(rows, a3[:95])
+
+
+def test__get_aligned_block_rows(tmp_path: Path) -> None:
+    """
+    Test `get_aligned_block_rows()`.
+    """
+
+    file_path = tmp_path / "test.hdf"
+    with h5py.File(file_path, "w") as f:
+        f.create_dataset(name="contiguous", data=np.zeros((100, 3)))
+        f.create_dataset("chunked", data=np.zeros((100, 3)), chunks=(7, 3))
+
+        # Contiguous datasets are read at once
+        assert get_aligned_block_rows(f["contiguous"]) == 100
+
+        # Chunked datasets are read in multiples of the chunk rows
+        # One chunk has 7 * 3 * 8 = 168 bytes
+        assert get_aligned_block_rows(f["chunked"], block_nbytes=400) == 14
+        assert get_aligned_block_rows(f["chunked"], block_nbytes=1) == 7
+        assert get_aligned_block_rows(f["chunked"]) == 100
+
+
+def test__get_row_chunks() -> None:
+    """
+    Test `get_row_chunks()`.
+    """
+
+    # Case 1: Scalar datasets cannot be chunked
+    assert get_row_chunks(shape=(), dtype=np.dtype("float32")) is None
+
+    # Case 2: 1D dataset
+    chunks = get_row_chunks(shape=(100,), dtype=np.dtype("float64"))
+    assert chunks == (131_072,)
+
+    # Case 3: 2D dataset
+    chunks = get_row_chunks(
+        shape=(100, 1024),
+        dtype=np.dtype("float32"),
+        target_nbytes=4096 * 8,
+    )
+    assert chunks == (8, 1024)
+
+    # Case 4: Rows that are larger than the target size
+    chunks = get_row_chunks(
+        shape=(100, 1024),
+        dtype=np.dtype("float32"),
+        target_nbytes=16,
+    )
+    assert chunks == (1, 1024)
+
+
+def test__rechunk_hdf_file(tmp_path: Path) -> None:
+    """
+    Test `rechunk_hdf_file()`.
+    """
+
+    # Create an HDF file with unchunked datasets
+    input_file_path = tmp_path / "input.hdf"
+    flux = np.arange(300, dtype=np.float32).reshape(100, 3)
+    wlen = np.arange(3, dtype=np.float32)
+    save_to_hdf(
+        file_path=input_file_path,
+        flux=flux,
+        wlen=wlen,
+        scalar=np.array(1.0),
+        empty=np.array([]),
+    )
+
+    # Rechunk the file and check that the data is unchanged
+    output_file_path = tmp_path / "output.hdf"
+    rechunk_hdf_file(
+        input_file_path=input_file_path,
+        output_file_path=output_file_path,
+        target_nbytes=12 * 8,
+    )
+    with h5py.File(output_file_path, "r") as f:
+        assert f["flux"].chunks == (8, 3)
+        assert f["flux"].compression == "lzf"
+        assert np.array_equal(f["flux"][...], flux)
+        assert np.array_equal(f["wlen"][...], wlen)
+        assert f["scalar"][()] == 1.0
+        assert f["empty"].shape == (0,)
+
+
+def test__lazy_hdf_array(tmp_path: Path) -> None:
+    """
+    Test `LazyHDFArray`.
+    """
+
+    file_path = tmp_path / "lazy.hdf"
+    data = np.arange(60, dtype=np.float32).reshape(20, 3)
+    with h5py.File(file_path, "w") as f:
+        f.create_dataset(name="x", data=data, chunks=(4, 3))
+        f.create_dataset(name="scalar", data=1.0)
+
+    # Case 1: Array-like attributes, restricted to the first `n_rows` rows
+    array = LazyHDFArray(file_path=file_path, key="x", n_rows=10)
+    assert array.shape == (10, 3)
+    assert array.ndim == 2
+    assert array.dtype == np.float32
+    assert len(array) == 10
+    assert LazyHDFArray(file_path=file_path, key="x", n_rows=99).shape[0] == 20
+
+    # Case 2: Single indices, slices and index arrays
+    assert np.array_equal(array[3], data[3])
+    assert np.array_equal(array[-1], data[9])
+    assert np.array_equal(array[2:5], data[2:5])
+    assert np.array_equal(array[::3], data[:10:3])
+    assert np.array_equal(array[[7, 2, 2, 5]], data[[7, 2, 2, 5]])
+    assert np.array_equal(np.asarray(array), data[:10])
+    array_64 = LazyHDFArray(file_path=file_path, key="x", dtype=np.float64)
+    assert array_64.dtype == np.float64
+    assert array_64[[1, 0]].dtype == np.float64
+    with pytest.raises(IndexError):
+        _ = array[10]
+    with pytest.raises(IndexError):
+        _ = array[[0, 10]]
+
+    # Case 3: The array can be pickled (e.g., for DataLoader workers)
+    restored = pickle.loads(pickle.dumps(array))
+    assert np.array_equal(restored[1], data[1])
+
+    # Case 4: Scalar datasets are not supported
+    with pytest.raises(ValueError, match="does not support scalar"):
+        LazyHDFArray(file_path=file_path, key="scalar")
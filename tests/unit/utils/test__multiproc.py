@@ -3,10 +3,46 @@ Tests for `fm4ar.utils.multiproc`.
 """
 
 import os
+from multiprocessing.shared_memory import SharedMemory
 
+import numpy as np
 from pytest import MonkeyPatch
 
-from fm4ar.utils.multiproc import get_number_of_available_cores
+from fm4ar.utils.multiproc import (
+    copy_to_shared_memory,
+    get_number_of_available_cores,
+    get_shared_array,
+)
+
+
+def test__copy_to_shared_memory__get_shared_array() -> None:
+    """
+    Test `fm4ar.utils.multiproc.copy_to_shared_memory()` and
+    `fm4ar.utils.multiproc.get_shared_array()`.
+    """
+
+    # Case 1: Copy an array to shared memory and attach to it by name
+    array = np.arange(12, dtype=np.float32).reshape(3, 4)
+    shm = copy_to_shared_memory(array)
+    other = SharedMemory(name=shm.name)
+    view = get_shared_array(other, array.shape, array.dtype)
+    assert np.array_equal(view, array)
+
+    # Changes through the view are visible in the original block
+    view[1] = -1
+    del view
+    other.close()
+    result = get_shared_array(shm, array.shape, array.dtype).copy()
+    assert np.array_equal(result[1], -np.ones(4))
+    assert np.array_equal(result[[0, 2]], array[[0, 2]])
+    shm.close()
+    shm.unlink()
+
+    # Case 2: Empty arrays
+    shm = copy_to_shared_memory(np.empty((0, 4)))
+    assert get_shared_array(shm, (0, 4), np.float64).shape == (0, 4)
+    shm.close()
+    shm.unlink()
 
 
 def test__get_number_of_available_cores(monkeypatch: MonkeyPatch) -> None:
@@ -16,6 +16,7 @@ def test__timeout_exception() -> None:
     assert "Timed out!" in str(timeout_exception)
 
 
+@pytest.mark.timing
 def test__timelimit() -> None:
 
     # Case 1